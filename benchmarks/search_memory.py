@@ -0,0 +1,139 @@
+"""
+Peak-RSS benchmark for find_station's decoding of large search responses.
+
+A loopback stand-in mirror serves N synthetic Radio Browser station records, and each decoding path
+fetches them in its own subprocess so ru_maxrss only sees that path:
+  buffered   r.json() and then one dict per station (how results were decoded before streaming)
+  streaming  _search_stations: _iter_json_array straight into compact _Station records
+Each child reports its peak RSS and how far that grew past a baseline taken just before the fetch.
+
+    python benchmarks/search_memory.py [--stations 20000]
+
+POSIX only (uses the resource module).
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("buffered", "streaming")
+
+
+def _station(i: int) -> dict:
+    """Shaped like a json/stations/search element, with every field Radio Browser sends."""
+    uuid = f"{i:08x}-0000-4000-8000-{i:012x}"
+    return {
+        "changeuuid": uuid, "stationuuid": uuid, "serveruuid": None, "name": f"Station {i} FM",
+        "url": f"http://stream{i % 500}.example.com:8000/live{i}", "url_resolved": f"http://stream{i % 500}.example.com:8000/live{i}.mp3",
+        "homepage": f"https://station{i}.example.com/", "favicon": f"https://station{i}.example.com/favicon.png",
+        "tags": "pop,rock,news,talk", "country": "Germany", "countrycode": "DE", "iso_3166_2": None, "state": "Berlin",
+        "language": "german", "languagecodes": "de", "votes": i % 1000, "lastchangetime": "2024-01-01 00:00:00",
+        "lastchangetime_iso8601": "2024-01-01T00:00:00Z", "codec": "MP3", "bitrate": 128, "hls": 0, "lastcheckok": 1,
+        "lastchecktime": "2024-01-02 00:00:00", "lastchecktime_iso8601": "2024-01-02T00:00:00Z",
+        "lastcheckoktime": "2024-01-02 00:00:00", "lastcheckoktime_iso8601": "2024-01-02T00:00:00Z",
+        "lastlocalchecktime": "2024-01-02 00:00:00", "lastlocalchecktime_iso8601": "2024-01-02T00:00:00Z",
+        "clicktimestamp": "2024-01-03 00:00:00", "clicktimestamp_iso8601": "2024-01-03T00:00:00Z",
+        "clickcount": i % 5000, "clicktrend": 0, "ssl_error": 0, "geo_lat": 52.52, "geo_long": 13.405,
+        "geo_distance": None, "has_extended_info": False,
+    }
+
+
+def _serve(body: bytes) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            payload = body if self.path.startswith("/json/stations/search") else b"{}"
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def _maxrss_mb() -> float:
+    # Linux reports KiB, macOS bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _legacy_record(s: dict) -> dict:
+    return {
+        "name": s.get("name"), "country": s.get("country"), "language": s.get("language"),
+        "bitrate": s.get("bitrate"), "codec": s.get("codec"), "homepage": s.get("homepage"),
+        "favicon": s.get("favicon"), "change_uuid": s.get("changeuuid"), "url": s.get("url"),
+        "url_resolved": s.get("url_resolved"), "stationuuid": s.get("stationuuid"),
+        "last_check_ok": s.get("lastcheckok"), "tags": s.get("tags"),
+    }
+
+
+def _child(mode: str, base: str, count: int) -> None:
+    os.environ["MCP_RADIO_MIRRORS"] = base
+    os.environ["MCP_RADIO_CATALOG"] = ""
+    sys.path.insert(0, ROOT)
+    import server
+
+    async def fetch():
+        params = {"name": "station", "limit": str(count)}
+        if mode == "streaming":
+            return await server._search_stations("station", None, None, count)
+        async with server._rb_stream("/json/stations/search", params) as r:
+            await r.aread()
+        return [_legacy_record(s) for s in r.json()]
+
+    async def main() -> None:
+        # Warm up the client, mirror probe and event loop before taking the baseline
+        async with server._rb_stream("/json/stats") as r:
+            await r.aread()
+        baseline = _maxrss_mb()
+        stations = await fetch()
+        assert len(stations) == count, len(stations)
+        print(json.dumps({"mode": mode, "baseline_mb": baseline, "peak_mb": _maxrss_mb()}))
+        await server._mirrors.aclose()
+        await server._close_http_client()
+
+    asyncio.run(main())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stations", type=int, default=20000)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "BASE_URL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child[0], args.child[1], args.stations)
+        return
+
+    body = json.dumps([_station(i) for i in range(args.stations)]).encode()
+    srv = _serve(body)
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    print(f"{args.stations} stations, {len(body) / 1e6:.1f} MB of JSON")
+    results = {}
+    try:
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, __file__, "--stations", str(args.stations), "--child", mode, base],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results[mode] = json.loads(out.strip().splitlines()[-1])
+            r = results[mode]
+            print(f"{mode:>10}: peak RSS {r['peak_mb']:.1f} MB (+{r['peak_mb'] - r['baseline_mb']:.1f} MB over baseline)")
+    finally:
+        srv.shutdown()
+    before, after = (results[m]["peak_mb"] for m in MODES)
+    print(f"streaming saves {before - after:.1f} MB of peak RSS")
+
+
+if __name__ == "__main__":
+    main()
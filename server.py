@@ -1,9 +1,23 @@
 import asyncio
-from typing import List, Optional, Dict, Any, Literal
+import copy
+import importlib.util
+import html
+import io
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, Literal, AsyncIterator, Tuple, Callable, Awaitable, Mapping, NamedTuple, Union
+from urllib.parse import urljoin, urlsplit
 import httpx
 import sys
 import os
 import tempfile
+import time
 import shlex
 import socket
 import subprocess
@@ -12,26 +26,935 @@ from mcp.server.fastmcp import FastMCP, Context
 APP_NAME = "mcp-radio/0.3"
 RB_BASE = "https://de1.api.radio-browser.info"
 
-mcp = FastMCP("radio-browser")
+# -------- Shared HTTP client --------
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get("MCP_RADIO_HTTP_MAX_CONNECTIONS", "32"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("MCP_RADIO_HTTP_MAX_KEEPALIVE", "16"))
+HTTP_KEEPALIVE_EXPIRY = 60.0
+HTTP_MAX_PER_HOST = int(os.environ.get("MCP_RADIO_HTTP_MAX_PER_HOST", "6"))
+# HTTP/2 needs the optional 'h2' package (pip install "httpx[http2]").
+HTTP2_ENABLED = os.environ.get("MCP_RADIO_HTTP2", "1") != "0"
+
+_http_client: Optional[httpx.AsyncClient] = None
+_host_slots: Dict[str, List[Any]] = {}  # host -> [semaphore, callers holding or waiting on it]
+
+def _get_http_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide pooled client, creating it on first use.
+    Every network path goes through this so search → resolve → play reuses warm connections.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        http2 = HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+        _http_client = httpx.AsyncClient(
+            headers={"User-Agent": APP_NAME},
+            timeout=20.0,
+            follow_redirects=True,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http_client
+
+async def _close_http_client() -> None:
+    global _http_client
+    client, _http_client = _http_client, None
+    _host_slots.clear()
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+@asynccontextmanager
+async def _host_slot(url: str) -> AsyncIterator[None]:
+    """
+    Cap concurrent requests per host so one slow stream host can't exhaust the shared pool.
+    """
+    host = (urlsplit(url).hostname or "").lower()
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = [asyncio.Semaphore(HTTP_MAX_PER_HOST), 0]
+    slot[1] += 1
+    try:
+        async with slot[0]:
+            yield
+    finally:
+        # Drop idle hosts so probing thousands of stream hosts doesn't grow this forever
+        slot[1] -= 1
+        if not slot[1] and _host_slots.get(host) is slot:
+            del _host_slots[host]
+
+# -------- Radio Browser mirrors --------
+
+RB_DISCOVERY_HOST = "all.api.radio-browser.info"
+# Comma-separated base URLs; when set, discovery is skipped (handy for local stand-ins).
+RB_MIRRORS = [m.strip().rstrip("/") for m in os.environ.get("MCP_RADIO_MIRRORS", "").split(",") if m.strip()]
+MIRROR_REFRESH_INTERVAL = 600.0
+MIRROR_PROBE_TIMEOUT = 3.0
+MIRROR_FAIL_COOLDOWN = 60.0
+
+class _MirrorRegistry:
+    """
+    Known Radio Browser servers, ranked by measured RTT.
+    Discovery and RTT probes run in the background; failed mirrors sit out a cooldown.
+    """
+
+    def __init__(self, static: Optional[List[str]] = None):
+        self.static = list(static or [])
+        self.mirrors: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._refreshed = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _entry(self, base: str) -> Dict[str, Any]:
+        return self.mirrors.setdefault(base, {"rtt_ms": None, "failures": 0, "down_until": 0.0})
+
+    def ranked(self) -> List[str]:
+        """Healthy mirrors fastest-first, then ones in cooldown as a last resort."""
+        for base in self.static or [RB_BASE]:
+            self._entry(base)
+        now = time.monotonic()
+        def key(base: str):
+            m = self.mirrors[base]
+            rtt = m["rtt_ms"] if m["rtt_ms"] is not None else float("inf")
+            return (m["down_until"] > now, rtt)
+        return sorted(self.mirrors, key=key)
+
+    def mark_ok(self, base: str, rtt_ms: Optional[float] = None) -> None:
+        m = self._entry(base)
+        m["failures"] = 0
+        m["down_until"] = 0.0
+        if rtt_ms is not None:
+            # Smooth so one slow response doesn't reorder everything
+            m["rtt_ms"] = rtt_ms if m["rtt_ms"] is None else 0.7 * m["rtt_ms"] + 0.3 * rtt_ms
+
+    def mark_failed(self, base: str) -> None:
+        m = self._entry(base)
+        m["failures"] += 1
+        m["down_until"] = time.monotonic() + MIRROR_FAIL_COOLDOWN * min(m["failures"], 5)
+
+    async def discover(self) -> List[str]:
+        if self.static:
+            return self.static
+        loop = asyncio.get_running_loop()
+        found: List[str] = []
+        try:
+            infos = await loop.getaddrinfo(RB_DISCOVERY_HOST, 443, proto=socket.IPPROTO_TCP)
+            for ip in {info[4][0] for info in infos}:
+                try:
+                    name = (await loop.run_in_executor(None, socket.gethostbyaddr, ip))[0]
+                except OSError:
+                    continue
+                found.append(f"https://{name}")
+        except OSError:
+            pass
+        if not found:
+            # DNS route unavailable; ask any known server for the list instead
+            for base in self.ranked():
+                try:
+                    r = await _get_http_client().get(f"{base}/json/servers", timeout=MIRROR_PROBE_TIMEOUT)
+                    r.raise_for_status()
+                    found = [f"https://{s['name']}" for s in r.json() if s.get("name")]
+                    break
+                except (httpx.HTTPError, ValueError):
+                    continue
+        return sorted(set(found))
+
+    async def _probe(self, base: str) -> None:
+        t0 = time.perf_counter()
+        try:
+            r = await _get_http_client().get(f"{base}/json/stats", timeout=MIRROR_PROBE_TIMEOUT)
+            r.raise_for_status()
+        except httpx.HTTPError:
+            self.mark_failed(base)
+            return
+        self.mark_ok(base, (time.perf_counter() - t0) * 1000)
+
+    async def refresh(self) -> None:
+        for base in await self.discover():
+            self._entry(base)
+        await asyncio.gather(*(self._probe(b) for b in list(self.mirrors)))
+        self._refreshed.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                self._refreshed.set()
+            await asyncio.sleep(MIRROR_REFRESH_INTERVAL)
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._refreshed = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def wait_refreshed(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._refreshed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def aclose(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+_mirrors = _MirrorRegistry(RB_MIRRORS)
+
+@asynccontextmanager
+async def _rb_stream(
+    path: str, params: Optional[Dict[str, str]] = None, timeout: float = 15.0
+) -> AsyncIterator[httpx.Response]:
+    """
+    Open a streaming GET for a Radio Browser API path on the fastest healthy mirror, failing
+    over on connection errors, timeouts and 5xx before the body is read. 4xx responses are
+    yielded to the caller as-is. The response is closed when the block exits.
+    """
+    _mirrors.start()
+    client = _get_http_client()
+    tried: List[str] = []
+    last_exc: Optional[Exception] = None
+    for attempt in range(2):
+        for base in _mirrors.ranked():
+            if base in tried:
+                continue
+            tried.append(base)
+            url = f"{base}{path}"
+            request = client.build_request(
+                "GET",
+                url,
+                params=params,
+                headers={"Accept": "application/json"},
+                timeout=httpx.Timeout(timeout, connect=MIRROR_PROBE_TIMEOUT),
+            )
+            t0 = time.perf_counter()
+            async with _host_slot(url):
+                try:
+                    r = await client.send(request, stream=True)
+                except httpx.TransportError as e:
+                    _mirrors.mark_failed(base)
+                    last_exc = e
+                    continue
+                try:
+                    if r.status_code >= 500:
+                        _mirrors.mark_failed(base)
+                        last_exc = httpx.HTTPStatusError(f"{r.status_code} from {base}", request=request, response=r)
+                        continue
+                    _mirrors.mark_ok(base, (time.perf_counter() - t0) * 1000)
+                    yield r
+                    return
+                finally:
+                    await r.aclose()
+        if attempt == 0:
+            # Everything known has failed; give background discovery a moment to find more
+            await _mirrors.wait_refreshed(MIRROR_PROBE_TIMEOUT)
+    raise last_exc or httpx.ConnectError("No Radio Browser mirror reachable")
+
+async def _iter_json_array(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Incrementally decode a top-level JSON array of objects as it streams off the socket,
+    yielding one element at a time instead of materializing the whole list.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    started = False
+    async for chunk in response.aiter_text():
+        buf += chunk
+        pos = 0
+        n = len(buf)
+        while True:
+            while pos < n and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= n:
+                break
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"Expected JSON array, got {buf[pos:pos + 20]!r}")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # element continues in the next chunk
+            if end >= n:
+                break  # "[1,2" may go on as "[1,23"; wait for the ',' or ']' that ends the element
+            pos = end
+            yield item
+        buf = buf[pos:]
+    # Only the closing ']' returns; a body cut off between elements must not pass as a complete list
+    raise ValueError("Truncated JSON array")
+
+# -------- Caching --------
+
+SEARCH_CACHE_TTL = float(os.environ.get("MCP_RADIO_SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("MCP_RADIO_SEARCH_CACHE_MAX_ENTRIES", "512"))
+SEARCH_CACHE_MAX_BYTES = int(os.environ.get("MCP_RADIO_SEARCH_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+RESOLVE_CACHE_TTL = float(os.environ.get("MCP_RADIO_RESOLVE_CACHE_TTL", "900"))
+RESOLVE_CACHE_NEGATIVE_TTL = float(os.environ.get("MCP_RADIO_RESOLVE_CACHE_NEGATIVE_TTL", "60"))
+RESOLVE_CACHE_MAX_ENTRIES = 2048
+RESOLVE_CACHE_MAX_BYTES = 2 * 1024 * 1024
+HOST_CAPS_TTL = float(os.environ.get("MCP_RADIO_HOST_CAPS_TTL", "3600"))
+HOST_CAPS_MAX_ENTRIES = 4096
+HOST_CAPS_MAX_BYTES = 1024 * 1024
+
+class _TTLCache:
+    """
+    In-memory LRU cache with per-entry expiry, bounded by entry count and approximate byte size.
+    Sizes are estimated once on insert from the JSON encoding of the value.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Any, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Any) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires, _, value = item
+        if expires <= time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Any) -> Any:
+        """Like get(), but for internal read-modify-write: no hit/miss counting and no LRU bump."""
+        item = self._data.get(key)
+        if item is None or item[0] <= time.monotonic():
+            return None
+        return item[2]
+
+    def put(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._drop(key)
+        self._data[key] = (time.monotonic() + ttl, size, value)
+        self._bytes += size
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._data)))
+            self.evictions += 1
+
+    def invalidate(self, key: Any) -> None:
+        if key in self._data:
+            self._drop(key)
+
+    def invalidate_where(self, pred: Callable[[Any, Any], bool]) -> int:
+        """Drop every entry for which pred(key, value) is true; returns how many were dropped."""
+        doomed = [k for k, (_, _, v) in self._data.items() if pred(k, v)]
+        for k in doomed:
+            self._drop(k)
+        return len(doomed)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    def _drop(self, key: Any) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "ttl_s": self.ttl,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+_search_cache = _TTLCache(SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_MAX_BYTES)
+# input URL -> resolve result, or {"error": ...} for a recent failure (kept for the shorter negative TTL)
+_resolve_cache = _TTLCache(RESOLVE_CACHE_TTL, RESOLVE_CACHE_MAX_ENTRIES, RESOLVE_CACHE_MAX_BYTES)
+# host:port -> what earlier probes learned about it: {head_ok, https_redirect (https origin), icy}
+_host_caps = _TTLCache(HOST_CAPS_TTL, HOST_CAPS_MAX_ENTRIES, HOST_CAPS_MAX_BYTES)
+
+def _invalidate_resolution(url: str) -> int:
+    """Forget cached resolutions that were requested for, or resolved to, this URL."""
+    return _resolve_cache.invalidate_where(lambda k, v: k == url or v.get("resolved_url") == url)
+
+def _search_key(
+    query: str, country: Optional[str], tag: Optional[str], limit: int, offset: int = 0
+) -> Tuple[Any, ...]:
+    def norm(v: Optional[str]) -> str:
+        return " ".join((v or "").split()).casefold()
+    return (norm(query), norm(country), norm(tag), limit, offset)
+
+# -------- Request coalescing and batching --------
+
+_inflight: Dict[Any, "asyncio.Future[Any]"] = {}
+
+async def _singleflight(key: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run fn() once per key at a time; concurrent callers with the same key await the same task.
+    The task is shielded so one caller cancelling doesn't cancel it for the others.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fn())
+        _inflight[key] = task
+        def _done(t: "asyncio.Future[Any]") -> None:
+            if _inflight.get(key) is t:
+                del _inflight[key]
+            if not t.cancelled():
+                t.exception()  # mark retrieved even if every caller went away
+        task.add_done_callback(_done)
+    return await asyncio.shield(task)
+
+BATCH_MAX_CONCURRENCY = 16
+
+async def _gather_bounded(
+    items: List[Any],
+    fn: Callable[[Any], Awaitable[Any]],
+    concurrency: int,
+    key: str = "item",
+    field: Optional[str] = "result",
+) -> List[Dict[str, Any]]:
+    """
+    Run fn(item) for every item with at most `concurrency` in flight.
+    Returns one {key: item, ok, field: result | error, elapsed_ms} per item, in input order;
+    field=None merges a dict result into the entry instead. One failure never sinks the batch.
+    """
+    sem = asyncio.Semaphore(max(1, min(concurrency, BATCH_MAX_CONCURRENCY)))
+
+    async def one(item: Any) -> Dict[str, Any]:
+        async with sem:
+            t0 = time.perf_counter()
+            out: Dict[str, Any] = {key: item, "ok": True}
+            try:
+                result = await fn(item)
+                if field is None:
+                    out.update(result)
+                else:
+                    out[field] = result
+            except Exception as e:
+                out.update(ok=False, error=_short_error(e))
+            out["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            return out
+
+    return await asyncio.gather(*(one(i) for i in items))
+
+async def _race_staggered(fns: List[Callable[[], Awaitable[Any]]], stagger: float) -> Optional[Tuple[int, Any]]:
+    """
+    Happy-eyeballs race: start fns[0], then each next one after `stagger` seconds or as soon as any
+    running attempt finishes without a result. The first attempt to return a non-None result wins and the rest are
+    cancelled. Returns (index, result), or None if every attempt failed.
+    """
+    tasks: Dict["asyncio.Future[Any]", int] = {}
+    pending: set = set()
+    try:
+        for i, fn in enumerate(fns):
+            t = asyncio.ensure_future(fn())
+            tasks[t] = i
+            pending.add(t)
+            last = i == len(fns) - 1
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=None if last else stagger, return_when=asyncio.FIRST_COMPLETED
+                )
+                for t in sorted(done, key=tasks.__getitem__):
+                    if not t.cancelled() and t.exception() is None and t.result() is not None:
+                        return tasks[t], t.result()
+                if not last:
+                    break  # stagger elapsed or an attempt failed: start the next one
+        return None
+    finally:
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+@asynccontextmanager
+async def _lifespan(server: FastMCP) -> AsyncIterator[Dict[str, Any]]:
+    try:
+        yield {}
+    finally:
+        if _catalog is not None:
+            _catalog.close()
+        await _mirrors.aclose()
+        await _stop_rc_watchers()
+        _close_rc_sessions()
+        await _close_http_client()
+
+mcp = FastMCP("radio-browser", lifespan=_lifespan)
 
 # -------- Station search/resolve --------
 
-def _norm_station(s: Dict[str, Any]) -> Dict[str, Any]:
-    return {
-        "name": s.get("name"),
-        "country": s.get("country"),
-        "language": s.get("language"),
-        "bitrate": s.get("bitrate"),
-        "codec": s.get("codec"),
-        "homepage": s.get("homepage"),
-        "favicon": s.get("favicon"),
-        "change_uuid": s.get("changeuuid"),
-        "url": s.get("url"),  # may be a playlist/redirect
-        "url_resolved": s.get("url_resolved"),
-        "stationuuid": s.get("stationuuid"),
-        "last_check_ok": s.get("lastcheckok"),
-        "tags": s.get("tags"),
-    }
+class _Station(NamedTuple):
+    """Compact, immutable station record; only turned into a dict at the tool boundary."""
+    name: Optional[str]
+    country: Optional[str]
+    language: Optional[str]
+    bitrate: Optional[int]
+    codec: Optional[str]
+    homepage: Optional[str]
+    favicon: Optional[str]
+    change_uuid: Optional[str]
+    url: Optional[str]  # may be a playlist/redirect
+    url_resolved: Optional[str]
+    stationuuid: Optional[str]
+    last_check_ok: Optional[int]
+    tags: Optional[str]
+    votes: Optional[int] = None
+    clickcount: Optional[int] = None
+    score: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = self._asdict()
+        if d["score"] is None:
+            del d["score"]
+        return d
+
+def _station_record(s: Mapping[str, Any]) -> _Station:
+    g = s.get
+    return _Station(
+        g("name"), g("country"), g("language"), g("bitrate"), g("codec"), g("homepage"), g("favicon"),
+        g("changeuuid"), g("url"), g("url_resolved"), g("stationuuid"), g("lastcheckok"), g("tags"),
+        g("votes"), g("clickcount"),
+    )
+
+# -------- Relevance ranking --------
+
+_RANK_WEIGHTS = {"text": 0.55, "votes": 0.1, "clicks": 0.1, "ok": 0.15, "bitrate": 0.05, "codec": 0.05}
+_GOOD_CODECS = frozenset({"MP3", "AAC", "AAC+", "OGG", "OPUS", "FLAC"})
+_NON_WORD = re.compile(r"[\W_]+")
+
+@lru_cache(maxsize=65536)
+def _rank_text(name: str) -> str:
+    """Casefolded words joined by single spaces and padded, so trigrams and ' word ' probes line up."""
+    return f"  {' '.join(_NON_WORD.sub(' ', name.casefold()).split())}  "
+
+def _rank_stations(query: str, stations: List[_Station]) -> List[_Station]:
+    """
+    Score candidates by name similarity to the query (character-trigram Dice + word overlap),
+    popularity, last check status, bitrate and codec; return them best-first with 'score' set.
+    Only the query's trigrams are materialized; each name is probed with substring checks,
+    which keeps ranking ~1,000 candidates within a few milliseconds.
+    """
+    if not stations:
+        return stations
+    w = _RANK_WEIGHTS
+    log1p = math.log1p
+    q_text = _rank_text(query or "")
+    q_grams = list({q_text[i:i + 3] for i in range(len(q_text) - 2)}) if q_text.strip() else []
+    q_words = [f" {word} " for word in q_text.split()]
+    n_q_grams = len(q_grams)
+    n_q_words = len(q_words) or 1
+    w_votes = w["votes"] / (log1p(max((s.votes or 0) for s in stations)) or 1.0)
+    w_clicks = w["clicks"] / (log1p(max((s.clickcount or 0) for s in stations)) or 1.0)
+    w_text, w_ok, w_codec = w["text"], w["ok"], w["codec"]
+    w_bitrate = w["bitrate"] / 320
+    good_codecs = _GOOD_CODECS
+    rank_text = _rank_text
+    scored = []
+    for s in stations:
+        text = 0.0
+        if q_grams:
+            n_text = rank_text(s.name or "")
+            if n_text == q_text:
+                text = 1.0
+            else:
+                contains = n_text.__contains__
+                grams = sum(map(contains, q_grams))
+                words = sum(map(contains, q_words))
+                text = 1.2 * grams / (n_q_grams + len(n_text) - 2) + 0.4 * words / n_q_words
+        score = (
+            w_text * text
+            + w_votes * log1p(s.votes or 0)
+            + w_clicks * log1p(s.clickcount or 0)
+            + (w_ok if s.last_check_ok else 0.0)
+            + w_bitrate * min(s.bitrate or 0, 320)
+            + (w_codec if (s.codec or "").upper() in good_codecs else 0.0)
+        )
+        scored.append((score, s))
+    scored.sort(key=lambda t: t[0], reverse=True)
+    make = tuple.__new__  # skip NamedTuple._make's per-call overhead
+    return [make(_Station, (*s[:-1], round(score, 4))) for score, s in scored]
+
+# -------- Offline station catalog --------
+
+# Path to a local SQLite file; when set, find_station is served from a full local copy of the directory.
+CATALOG_PATH = os.environ.get("MCP_RADIO_CATALOG") or None
+CATALOG_SYNC_INTERVAL = float(os.environ.get("MCP_RADIO_CATALOG_SYNC_INTERVAL", "3600"))
+CATALOG_SYNC_PAGE = 5000
+
+_CATALOG_COLUMNS = (
+    "stationuuid", "changeuuid", "name", "country", "countrycode", "language", "tags", "bitrate", "codec",
+    "homepage", "favicon", "url", "url_resolved", "lastcheckok", "votes", "clickcount", "lastchangetime_iso8601",
+)
+
+_CATALOG_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS stations (
+    {", ".join(c + (" TEXT PRIMARY KEY" if c == "stationuuid" else "") for c in _CATALOG_COLUMNS)}
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS stations_fts USING fts5(
+    name, tags, country, language,
+    content='stations', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS stations_ai AFTER INSERT ON stations BEGIN
+    INSERT INTO stations_fts(rowid, name, tags, country, language)
+    VALUES (new.rowid, new.name, new.tags, new.country, new.language);
+END;
+CREATE TRIGGER IF NOT EXISTS stations_ad AFTER DELETE ON stations BEGIN
+    INSERT INTO stations_fts(stations_fts, rowid, name, tags, country, language)
+    VALUES ('delete', old.rowid, old.name, old.tags, old.country, old.language);
+END;
+CREATE TRIGGER IF NOT EXISTS stations_au AFTER UPDATE ON stations BEGIN
+    INSERT INTO stations_fts(stations_fts, rowid, name, tags, country, language)
+    VALUES ('delete', old.rowid, old.name, old.tags, old.country, old.language);
+    INSERT INTO stations_fts(rowid, name, tags, country, language)
+    VALUES (new.rowid, new.name, new.tags, new.country, new.language);
+END;
+CREATE INDEX IF NOT EXISTS stations_votes ON stations(votes);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_CATALOG_UPSERT = (
+    f"INSERT INTO stations ({', '.join(_CATALOG_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in _CATALOG_COLUMNS)}) "
+    f"ON CONFLICT(stationuuid) DO UPDATE SET "
+    + ", ".join(f"{c}=excluded.{c}" for c in _CATALOG_COLUMNS if c != "stationuuid")
+)
+# Change records from json/stations/changed are history entries without url_resolved, lastcheckok,
+# codec, bitrate or clickcount; keep the stored value wherever a record leaves a column out
+_CATALOG_MERGE = (
+    f"INSERT INTO stations ({', '.join(_CATALOG_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in _CATALOG_COLUMNS)}) "
+    f"ON CONFLICT(stationuuid) DO UPDATE SET "
+    + ", ".join(f"{c}=COALESCE(excluded.{c}, {c})" for c in _CATALOG_COLUMNS if c != "stationuuid")
+)
+
+def _catalog_row(s: Mapping[str, Any]) -> Tuple[Any, ...]:
+    return tuple(s.get(c) for c in _CATALOG_COLUMNS)
+
+def _utc_now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+def _fts_phrase(text: str, prefix: bool = False) -> Optional[str]:
+    tokens = re.findall(r"\w+", text)
+    if not tokens:
+        return None
+    if prefix:
+        return "(" + " AND ".join(f'"{t}"*' for t in tokens) + ")"
+    return '"' + " ".join(tokens) + '"'
+
+class _StationCatalog:
+    """
+    Full Radio Browser station list in SQLite with an FTS5 index over name/tags/country/language.
+    All SQLite work runs in a worker thread behind one lock; rebuilds write a fresh file and swap it in.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.error: Optional[str] = None
+        self._has_data = False
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.last_sync: Optional[Dict[str, Any]] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._build_task: Optional[asyncio.Task] = None
+        self._sync_task: Optional[asyncio.Task] = None
+
+    def _connect(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_CATALOG_SCHEMA)
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = self._connect(self.path)
+        return self._conn
+
+    def _meta(self, conn: sqlite3.Connection) -> Dict[str, str]:
+        return {k: v for k, v in conn.execute("SELECT key, value FROM meta")}
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._open().execute("SELECT count(*) FROM stations").fetchone()[0]
+
+    def _status(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._open()
+            count = conn.execute("SELECT count(*) FROM stations").fetchone()[0]
+            return {"path": self.path, "stations": count, "ready": count > 0, **self._meta(conn)}
+
+    def _search(
+        self, query: str, country: Optional[str], tag: Optional[str], limit: int, offset: int
+    ) -> List[Dict[str, Any]]:
+        clauses = []
+        for col, text, prefix in (("name", query, True), ("country", country, False), ("tags", tag, False)):
+            expr = _fts_phrase(text or "", prefix)
+            if expr:
+                clauses.append(f"{col} : {expr}")
+        with self._lock:
+            conn = self._open()
+            if clauses:
+                # bm25 ordering costs ~10x more than sorting matches by popularity
+                rows = conn.execute(
+                    "SELECT * FROM stations WHERE rowid IN "
+                    "(SELECT rowid FROM stations_fts WHERE stations_fts MATCH ?) "
+                    "ORDER BY votes DESC, rowid LIMIT ? OFFSET ?",
+                    (" AND ".join(clauses), limit, offset),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM stations ORDER BY votes DESC, rowid LIMIT ? OFFSET ?", (limit, offset)
+                ).fetchall()
+        return [dict(r) for r in rows]
+
+    def _last_change_uuid(self) -> Optional[str]:
+        with self._lock:
+            return self._meta(self._open()).get("last_change_uuid")
+
+    def _apply_changes(self, rows: List[Tuple[Any, ...]], last_change_uuid: str) -> None:
+        with self._lock:
+            conn = self._open()
+            with conn:
+                conn.executemany(_CATALOG_MERGE, rows)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    [("last_change_uuid", last_change_uuid), ("synced_at", _utc_now())],
+                )
+
+    def _rebuild(self, rows: List[Tuple[Any, ...]], meta: Dict[str, Any]) -> int:
+        tmp = self.path + ".building"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        conn = self._connect(tmp)
+        try:
+            with conn:
+                conn.executemany(_CATALOG_UPSERT, rows)
+                conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [(k, str(v)) for k, v in meta.items()])
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+            os.replace(tmp, self.path)
+            self._open()
+        return len(rows)
+
+    async def ready(self) -> bool:
+        if self._has_data:
+            return True
+        try:
+            self._has_data = await asyncio.to_thread(self._count) > 0
+            return self._has_data
+        except sqlite3.Error as e:
+            self.error = repr(e)
+            return False
+
+    async def search(
+        self, query: str, country: Optional[str], tag: Optional[str], limit: int, offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._search, query, country, tag, limit, offset)
+
+    async def status(self) -> Dict[str, Any]:
+        try:
+            st = await asyncio.to_thread(self._status)
+        except sqlite3.Error as e:
+            st = {"path": self.path, "ready": False}
+            self.error = repr(e)
+        st["building"] = self._build_task is not None and not self._build_task.done()
+        st["last_sync"] = self.last_sync
+        st["error"] = self.error
+        return st
+
+    async def build(self) -> Dict[str, Any]:
+        """Download the full station list and swap in a freshly indexed catalog."""
+        async with self._writer():
+            t0 = time.perf_counter()
+            rows: List[Tuple[Any, ...]] = []
+            newest: Tuple[str, Optional[str]] = ("", None)
+            async with _rb_stream("/json/stations", timeout=300.0) as r:
+                r.raise_for_status()
+                # ~40k stations: keep only the catalog columns, never the whole decoded list
+                async for s in _iter_json_array(r):
+                    rows.append(_catalog_row(s))
+                    changed_at = s.get("lastchangetime_iso8601") or ""
+                    if changed_at > newest[0]:
+                        newest = (changed_at, s.get("changeuuid"))
+            meta = {"built_at": _utc_now()}
+            if newest[1]:
+                # Starting point for the change feed used by sync()
+                meta["last_change_uuid"] = newest[1]
+            try:
+                count = await asyncio.to_thread(self._rebuild, rows, meta)
+            except sqlite3.Error as e:
+                self.error = repr(e)
+                raise
+            self.error = None
+            self._has_data = count > 0
+            return {
+                "ok": True,
+                "stations": count,
+                "bytes": r.num_bytes_downloaded,
+                "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+            }
+
+    def _writer(self) -> asyncio.Lock:
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        return self._write_lock
+
+    async def sync(self) -> Dict[str, Any]:
+        """
+        Apply station changes since the last build/sync from json/stations/changed.
+        The feed has no deletions, so removed stations linger until the next full build.
+        """
+        last_uuid = await asyncio.to_thread(self._last_change_uuid)
+        if not last_uuid:
+            report = await self.build()
+            report["mode"] = "full"
+            self.last_sync = report
+            return report
+        async with self._writer():
+            t0 = time.perf_counter()
+            changed: set = set()
+            transferred = pages = 0
+            while True:
+                rows: List[Tuple[Any, ...]] = []
+                async with _rb_stream(
+                    "/json/stations/changed",
+                    {"lastchangeuuid": last_uuid, "limit": str(CATALOG_SYNC_PAGE)},
+                    timeout=120.0,
+                ) as r:
+                    r.raise_for_status()
+                    async for c in _iter_json_array(r):
+                        rows.append(_catalog_row(c))
+                        changed.add(c.get("stationuuid"))
+                        last_uuid = c.get("changeuuid") or last_uuid
+                transferred += r.num_bytes_downloaded
+                pages += 1
+                if not rows:
+                    break
+                await asyncio.to_thread(self._apply_changes, rows, last_uuid)
+                if len(rows) < CATALOG_SYNC_PAGE:
+                    break
+            self.last_sync = {
+                "ok": True,
+                "mode": "incremental",
+                "at": _utc_now(),
+                "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "rows_changed": len(changed),
+                "bytes": transferred,
+                "pages": pages,
+            }
+            return self.last_sync
+
+    def start_sync(self) -> None:
+        """Keep the catalog fresh in the background; tool calls never wait on it."""
+        if CATALOG_SYNC_INTERVAL <= 0:
+            return
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.get_running_loop().create_task(self._sync_loop())
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(CATALOG_SYNC_INTERVAL)
+            try:
+                await self.sync()
+            except Exception as e:
+                self.last_sync = {"ok": False, "at": _utc_now(), "error": repr(e)}
+
+    def build_in_background(self) -> None:
+        if self._build_task is None or self._build_task.done():
+            self._build_task = asyncio.get_running_loop().create_task(self._build_quietly())
+
+    async def _build_quietly(self) -> None:
+        try:
+            await self.build()
+        except Exception as e:
+            self.error = repr(e)
+
+    def close(self) -> None:
+        for task in (self._build_task, self._sync_task):
+            if task is not None and not task.done():
+                task.cancel()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_catalog: Optional[_StationCatalog] = _StationCatalog(CATALOG_PATH) if CATALOG_PATH else None
+
+async def _catalog_if_ready() -> Optional[_StationCatalog]:
+    """The catalog when it has data; kicks off a first build in the background if it is empty."""
+    if _catalog is None:
+        return None
+    if await _catalog.ready():
+        _catalog.start_sync()
+        return _catalog
+    _catalog.build_in_background()
+    return None
+
+FIND_STATION_PAGE_SIZE = 25
+
+async def _search_stations(
+    query: str, country: Optional[str], tag: Optional[str], limit: int, offset: int = 0
+) -> List[_Station]:
+    """One page of search results from the offline catalog, the cache, or Radio Browser."""
+    catalog = await _catalog_if_ready()
+    if catalog is not None:
+        return [_station_record(s) for s in await catalog.search(query, country, tag, limit, offset)]
+
+    key = _search_key(query, country, tag, limit, offset)
+    cached = _search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    params = {"name": query, "limit": str(limit)}
+    if offset: params["offset"] = str(offset)
+    if country: params["country"] = country
+    if tag: params["tag"] = tag
+
+    async def fetch() -> List[_Station]:
+        async with _rb_stream("/json/stations/search", params, timeout=15.0) as r:
+            r.raise_for_status()
+            stations = [_station_record(s) async for s in _iter_json_array(r)]
+        _search_cache.put(key, stations)
+        return stations
+
+    # Concurrent identical searches share one upstream request
+    return await _singleflight(("find_station", key), fetch)
 
 @mcp.tool()
 async def find_station(
@@ -39,92 +962,832 @@ async def find_station(
     country: Optional[str] = None,
     tag: Optional[str] = None,
     limit: int = 10,
+    offset: int = 0,
+    progressive: bool = False,
+    rank: bool = True,
     ctx: Context = None,
 ) -> List[Dict[str, Any]]:
     """
     Search Radio Browser for stations and return a list of candidates.
     Prefer 'url_resolved' if present; otherwise use 'url' and call get_playable_stream.
+    - offset skips that many results; for the next page call again with offset += limit.
+    - progressive=True fetches in pages of 25 and reports each page (even a single one) as an MCP
+      progress notification when it arrives, so the first good candidate can be used early. With
+      rank=True each notified page is ranked best-first on its own, with 'score'; the returned list
+      is re-ranked across all pages, so its scores can differ slightly.
+    - rank=True (default) re-orders the returned results best match first and adds a 'score'
+      (name similarity, popularity, last check, bitrate, codec); rank=False keeps upstream order.
+    Identical searches are served from a short-lived in-memory cache, or from the
+    local offline catalog when one is configured (MCP_RADIO_CATALOG).
     """
-    params = {"name": query, "limit": str(limit)}
-    if country: params["country"] = country
-    if tag: params["tag"] = tag
+    if not progressive:
+        stations = await _search_stations(query, country, tag, limit, offset)
+        if rank:
+            stations = _rank_stations(query, stations)
+        return [s.to_dict() for s in stations]
+
+    stations = []
+    while len(stations) < limit:
+        want = min(FIND_STATION_PAGE_SIZE, limit - len(stations))
+        page = await _search_stations(query, country, tag, want, offset + len(stations))
+        stations.extend(page)
+        if ctx is not None and page:
+            summary = []
+            for s in _rank_stations(query, page) if rank else page:
+                item = {"name": s.name, "country": s.country, "url_resolved": s.url_resolved, "stationuuid": s.stationuuid}
+                if s.score is not None:
+                    item["score"] = s.score
+                summary.append(item)
+            await ctx.report_progress(len(stations), limit, json.dumps(summary, ensure_ascii=False))
+        if len(page) < want:
+            break
+    if rank:
+        stations = _rank_stations(query, stations)
+    return [s.to_dict() for s in stations]
+
+@mcp.tool()
+async def find_stations_batch(
+    queries: List[str],
+    country: Optional[str] = None,
+    tag: Optional[str] = None,
+    limit: int = 5,
+    rank: bool = True,
+    concurrency: int = 4,
+    ctx: Context = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run several find_station searches at once (e.g. a list of presets) instead of one call per station.
+    country/tag/limit/rank apply to every query; at most `concurrency` searches run at a time.
+    Returns one { query, ok, stations | error, elapsed_ms } per query, in input order.
+    """
+    async def search(query: str) -> List[Dict[str, Any]]:
+        stations = await _search_stations(query, country, tag, limit)
+        if rank:
+            stations = _rank_stations(query, stations)
+        return [s.to_dict() for s in stations]
+
+    return await _gather_bounded(queries, search, concurrency, key="query", field="stations")
+
+@mcp.tool()
+async def cache_stats(ctx: Context = None) -> Dict[str, Any]:
+    """Return hit/miss counters and sizes for the server's in-memory caches."""
+    return {
+        "find_station": _search_cache.stats(),
+        "get_playable_stream": _resolve_cache.stats(),
+        "host_capabilities": _host_caps.stats(),
+    }
+
+@mcp.tool()
+async def catalog_status(ctx: Context = None) -> Dict[str, Any]:
+    """Report whether the offline station catalog is enabled, populated and when it was built."""
+    if _catalog is None:
+        return {"enabled": False, "note": "Set MCP_RADIO_CATALOG to a file path to enable the offline catalog."}
+    return {"enabled": True, **await _catalog.status()}
+
+@mcp.tool()
+async def catalog_sync(ctx: Context = None) -> Dict[str, Any]:
+    """
+    Apply station changes since the last sync to the offline catalog now.
+    Returns duration, rows changed and bytes transferred.
+    """
+    if _catalog is None:
+        return {"ok": False, "error": "Offline catalog disabled; set MCP_RADIO_CATALOG to a file path."}
+    try:
+        return await _catalog.sync()
+    except Exception as e:
+        return {"ok": False, "error": repr(e)}
+
+@mcp.tool()
+async def catalog_build(ctx: Context = None) -> Dict[str, Any]:
+    """
+    Download the full Radio Browser station list and rebuild the offline catalog now.
+    Searches keep using the previous catalog (or the network) until the new one is ready.
+    """
+    if _catalog is None:
+        return {"ok": False, "error": "Offline catalog disabled; set MCP_RADIO_CATALOG to a file path."}
+    try:
+        return await _catalog.build()
+    except Exception as e:
+        return {"ok": False, "error": repr(e)}
+
+PROBE_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+# Bytes read from a stream whose type is still unknown after headers (playlists get PLAYLIST_MAX_BYTES).
+PROBE_MAX_BYTES = int(os.environ.get("MCP_RADIO_PROBE_MAX_BYTES", "16384"))
+PLAYLIST_MAX_BYTES = 512 * 1024
+SNIFF_MAX_BYTES = 4096  # read from audio/* responses so the codec can be sniffed
+PLAYLIST_MAX_CANDIDATES = 8
+RESOLVE_MAX_DEPTH = int(os.environ.get("MCP_RADIO_RESOLVE_MAX_DEPTH", "4"))
+RESOLVE_RACE_STAGGER = float(os.environ.get("MCP_RADIO_RESOLVE_RACE_STAGGER", "0.25"))
+
+_PLAYLIST_TYPES = ("mpegurl", "scpls", "x-pls", "xspf", "x-ms-asf", "x-ms-wax", "x-ms-wvx", "video/x-ms-asx")
+
+def _is_playlist_type(ct: Optional[str]) -> bool:
+    ct = (ct or "").lower()
+    return any(t in ct for t in _PLAYLIST_TYPES)
+
+def _is_audio_type(ct: Optional[str]) -> bool:
+    """audio/* or Ogg, excluding playlist types that live under audio/ (audio/x-mpegurl, audio/x-scpls)."""
+    ct = (ct or "").lower()
+    return ("audio/" in ct or "application/ogg" in ct) and not _is_playlist_type(ct)
+
+def _short_error(e: Exception) -> str:
+    """One-line error for notes[]; httpx status errors otherwise carry a multi-line help URL."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return f"HTTP {e.response.status_code}"
+    return f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+
+class _ProbeResult(NamedTuple):
+    response: httpx.Response  # already closed; headers, status and final URL remain available
+    body: bytes  # at most the byte budget for this content type
+    truncated: bool
+
+    @property
+    def url(self) -> str:
+        return str(self.response.url)
+
+    @property
+    def content_type(self) -> str:
+        return self.response.headers.get("content-type", "")
 
-    url = f"{RB_BASE}/json/stations/search"
-    headers = {"User-Agent": APP_NAME, "Accept": "application/json"}
-    async with httpx.AsyncClient(headers=headers, timeout=15.0, follow_redirects=True) as client:
-        r = await client.get(url, params=params)
-        r.raise_for_status()
-        stations = r.json()
-    return [_norm_station(s) for s in stations]
-
-def _parse_playlist(text: str) -> Optional[str]:
-    """
-    Extract first stream URL from a simple .m3u/.m3u8/.pls body.
-    """
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    # PLS
-    for ln in lines:
-        if ln.lower().startswith("file") and "=" in ln:
-            cand = ln.split("=", 1)[1].strip()
-            if cand.startswith("http"):
-                return cand
-    # M3U
-    for ln in lines:
-        if not ln.startswith("#") and ln.startswith("http"):
-            return ln
+    def text(self) -> str:
+        return self.body.decode(self.response.charset_encoding or "utf-8-sig", errors="replace")
+
+async def _probe_get(url: str, headers: Dict[str, str], max_bytes: Optional[int] = None) -> _ProbeResult:
+    """
+    Streamed GET that reads the headers plus a bounded prefix of the body, then closes the connection.
+    Audio responses read only SNIFF_MAX_BYTES, so live Icecast/Shoutcast bodies are never downloaded.
+    """
+    client = _get_http_client()
+    async with _host_slot(url):
+        async with client.stream("GET", url, headers=headers, timeout=PROBE_TIMEOUT) as r:
+            ct = r.headers.get("content-type", "")
+            if max_bytes is None:
+                if _is_audio_type(ct):
+                    max_bytes = SNIFF_MAX_BYTES
+                elif _is_playlist_type(ct) or (("text" in ct or "xml" in ct) and "html" not in ct):
+                    max_bytes = PLAYLIST_MAX_BYTES
+                else:
+                    max_bytes = PROBE_MAX_BYTES
+            buf = bytearray()
+            truncated = False
+            if max_bytes > 0 and r.status_code < 400:
+                async for chunk in r.aiter_bytes():
+                    buf += chunk
+                    if len(buf) >= max_bytes:
+                        truncated = True
+                        del buf[max_bytes:]
+                        break
+            else:
+                truncated = True
+        return _ProbeResult(r, bytes(buf), truncated)
+
+# -------- Audio sniffing --------
+
+_MPEG_BITRATES = {  # kbps by (version 1 or 2, layer)
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MPEG_BITRATES[(2, 3)] = _MPEG_BITRATES[(2, 2)]
+_MPEG_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_ADTS_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+_SNIFF_MIN_FRAMES = 3
+
+def _mpeg_frame(b: bytes, i: int) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """Parse an MPEG-1/2/2.5 audio frame header at b[i]; returns (frame_length, info) or None."""
+    b1, b2, b3 = b[i + 1], b[i + 2], b[i + 3]
+    version_bits, layer = (b1 >> 3) & 3, 4 - ((b1 >> 1) & 3)
+    br_index, sr_index = b2 >> 4, (b2 >> 2) & 3
+    if version_bits == 1 or layer == 4 or br_index in (0, 15) or sr_index == 3:
+        return None
+    version = 1 if version_bits == 3 else 2
+    bitrate = _MPEG_BITRATES[(version, layer)][br_index]
+    rate = _MPEG_RATES[version_bits][sr_index]
+    pad = (b2 >> 1) & 1
+    if layer == 1:
+        length = (12000 * bitrate // rate + pad) * 4
+    else:
+        length = (72000 if version == 2 and layer == 3 else 144000) * bitrate // rate + pad
+    codec = "MP3" if layer == 3 else f"MP{layer}"
+    return length, {"codec": codec, "mime": "audio/mpeg", "bitrate": bitrate, "sample_rate": rate,
+                    "channels": 1 if b3 >> 6 == 3 else 2}
+
+def _adts_frame(b: bytes, i: int) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """Parse an AAC ADTS header at b[i]; returns (frame_length, info) or None. Bitrate is filled in by the caller."""
+    if i + 7 > len(b):
+        return None
+    b2, b3 = b[i + 2], b[i + 3]
+    sr_index = (b2 >> 2) & 0xF
+    length = ((b3 & 3) << 11) | (b[i + 4] << 3) | (b[i + 5] >> 5)
+    if sr_index >= len(_ADTS_RATES) or length < 7:
+        return None
+    profile = ("AAC Main", "AAC-LC", "AAC SSR", "AAC LTP")[b2 >> 6]
+    return length, {"codec": profile, "mime": "audio/aac", "sample_rate": _ADTS_RATES[sr_index],
+                    "channels": ((b2 & 1) << 2) | (b3 >> 6) or None}
+
+def _sniff_frames(b: bytes, start: int) -> Optional[Dict[str, Any]]:
+    """Find MP3 or ADTS sync words and accept the first run of consistent back-to-back frames."""
+    i = b.find(b"\xff", start)
+    while 0 <= i <= len(b) - 4:
+        b1 = b[i + 1]
+        if b1 & 0xE0 == 0xE0:
+            parse = _adts_frame if b1 & 0xF6 == 0xF0 else _mpeg_frame
+            first = parse(b, i)
+            if first:
+                length, info = first
+                j, frames, total = i + length, 1, length
+                while j <= len(b) - 4 and b[j] == 0xFF and b[j + 1] == b1:
+                    nxt = parse(b, j)
+                    if not nxt or nxt[1]["sample_rate"] != info["sample_rate"]:
+                        break
+                    frames, total, j = frames + 1, total + nxt[0], j + nxt[0]
+                # A run that reaches the end of the buffer is as good as it gets for short prefixes
+                if frames >= _SNIFF_MIN_FRAMES or (frames >= 2 and j > len(b) - 4):
+                    if parse is _adts_frame:
+                        info["bitrate"] = round(total * 8 * info["sample_rate"] / (1024 * frames) / 1000)
+                    return info
+        i = b.find(b"\xff", i + 1)
     return None
 
+def _sniff_ogg(b: bytes) -> Dict[str, Any]:
+    packet = b[27 + b[26]:] if len(b) > 27 else b""
+    if packet.startswith(b"\x01vorbis") and len(packet) >= 24:
+        nominal = int.from_bytes(packet[20:24], "little", signed=True)
+        return {"codec": "Vorbis", "mime": "audio/ogg", "sample_rate": int.from_bytes(packet[12:16], "little"),
+                "channels": packet[11], "bitrate": round(nominal / 1000) if nominal > 0 else None}
+    if packet.startswith(b"OpusHead") and len(packet) >= 19:
+        return {"codec": "Opus", "mime": "audio/ogg", "sample_rate": 48000, "channels": packet[9]}
+    if packet.startswith(b"\x7fFLAC"):
+        info = _sniff_flac(packet[9:])
+        info["mime"] = "audio/ogg"
+        return info
+    return {"codec": None, "mime": "audio/ogg"}
+
+def _sniff_flac(b: bytes) -> Dict[str, Any]:
+    info: Dict[str, Any] = {"codec": "FLAC", "mime": "audio/flac"}
+    if b.startswith(b"fLaC") and len(b) >= 8 + 18 and b[4] & 0x7F == 0:  # STREAMINFO comes first
+        si = b[8:]
+        info["sample_rate"] = (si[10] << 12) | (si[11] << 4) | (si[12] >> 4)
+        info["channels"] = ((si[12] >> 1) & 7) + 1
+    return info
+
+def _sniff_audio(data: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Identify an audio stream from the first bytes of its body: ID3-tagged or bare MP3 frames, AAC ADTS,
+    Ogg (Vorbis/Opus/FLAC), native FLAC or an MPEG transport stream.
+    Returns { codec, mime, bitrate (kbps), sample_rate, channels } with unknown fields omitted, or None.
+    """
+    if len(data) < 4:
+        return None
+    if data.startswith(b"OggS"):
+        info = _sniff_ogg(data)
+    elif data.startswith(b"fLaC"):
+        info = _sniff_flac(data)
+    elif data[0] == 0x47 and len(data) > 376 and data[188] == 0x47 and data[376] == 0x47:
+        info = {"codec": None, "mime": "video/mp2t", "container": "MPEG-TS"}
+    else:
+        start = 0
+        if data.startswith(b"ID3") and len(data) >= 10 and data[3] in (2, 3, 4):
+            size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+            start = 10 + size + (10 if data[5] & 0x10 else 0)
+            if start >= len(data) - 4:
+                # Tag (often with cover art) runs past the prefix; ID3v2 in a stream is all but always MP3
+                return {"codec": "MP3", "mime": "audio/mpeg"}
+        info = _sniff_frames(data, start)
+        if info is None:
+            return None
+    return {k: v for k, v in info.items() if v is not None}
+
+class _PlaylistEntry(NamedTuple):
+    url: str
+    title: Optional[str] = None
+    duration: Optional[float] = None  # seconds; -1/None for live
+    bandwidth: Optional[int] = None  # HLS variants
+    codecs: Optional[str] = None  # HLS variants
+
+class _Playlist(NamedTuple):
+    format: Optional[str]  # pls | m3u | hls_master | hls_media | xspf | asx | None
+    entries: List[_PlaylistEntry]
+
+_HLS_ATTR = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+_PLS_LINE = re.compile(r"^[ \t]*(file|title|length)(\d+)[ \t]*=([^\r\n]*)", re.MULTILINE | re.IGNORECASE)
+_XSPF_TOKEN = re.compile(r"<(/?)track\b[^>]*>|<(location|title)\b[^>]*>\s*(.*?)\s*</\2\s*>", re.IGNORECASE | re.DOTALL)
+_ASX_TOKEN = re.compile(
+    r"<(/?)entry\b[^>]*>|<title\b[^>]*>\s*(.*?)\s*</title\s*>|<(ref|entryref)\b([^>]*)>", re.IGNORECASE | re.DOTALL
+)
+_ASX_HREF = re.compile(r"""\bhref\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+
+def _parse_xml_playlist(text: str, base_url: Optional[str]) -> _Playlist:
+    join = (lambda u: urljoin(base_url, u)) if base_url else (lambda u: u)
+    head = text[:512].lower()
+    entries: List[_PlaylistEntry] = []
+    if "<playlist" in head and "xspf" in head:
+        fields: Optional[Dict[str, str]] = None
+        for m in _XSPF_TOKEN.finditer(text):
+            if m.group(2) is None:
+                if m.group(1):  # </track>
+                    if fields and fields.get("location"):
+                        entries.append(_PlaylistEntry(join(fields["location"]), fields.get("title")))
+                    fields = None
+                else:
+                    fields = {}
+            elif fields is not None:  # ignore the playlist-level <title>
+                fields.setdefault(m.group(2).lower(), html.unescape(m.group(3)))
+        return _Playlist("xspf", entries)
+    if "<asx" in head:
+        # ASX is frequently not well-formed XML (mixed-case tags, bare '&'), so walk its tags instead
+        title: Optional[str] = None
+        in_entry = False
+        for m in _ASX_TOKEN.finditer(text):
+            if m.group(3):  # <ref href> / <entryref href>
+                href = _ASX_HREF.search(m.group(4))
+                if href:
+                    is_ref = m.group(3).lower() == "ref"
+                    entries.append(_PlaylistEntry(join(html.unescape(href.group(1))), title if is_ref else None))
+            elif m.group(2) is not None:
+                if in_entry:
+                    title = html.unescape(m.group(2))
+            else:
+                in_entry = not m.group(1)
+                title = None
+        return _Playlist("asx", entries)
+    return _Playlist(None, entries)
+
+def _parse_playlist(text: str, base_url: Optional[str] = None) -> _Playlist:
+    """
+    Parse a PLS, M3U/EXTM3U, HLS (master or media), XSPF or ASX/WAX body into every entry it lists.
+    Each format is scanned in a single pass over the text without building a list of its lines;
+    relative entries are resolved against base_url.
+    """
+    stripped = text.lstrip("\ufeff \t\r\n")
+    if stripped.startswith("<"):
+        return _parse_xml_playlist(stripped, base_url)
+
+    join = (lambda u: urljoin(base_url, u)) if base_url else (lambda u: u)
+    entries: List[_PlaylistEntry] = []
+    if stripped[:10].lower().startswith("[playlist]") or _PLS_LINE.match(stripped):
+        pls: Dict[int, Dict[str, str]] = {}
+        for m in _PLS_LINE.finditer(stripped):
+            pls.setdefault(int(m.group(2)), {})[m.group(1).lower()] = m.group(3).strip()
+        for _, e in sorted(pls.items()):
+            if e.get("file"):
+                try:
+                    length = float(e["length"]) if "length" in e else None
+                except ValueError:
+                    length = None
+                entries.append(_PlaylistEntry(join(e["file"]), e.get("title") or None, length))
+        return _Playlist("pls", entries)
+
+    fmt: Optional[str] = None
+    pending: Dict[str, Any] = {}
+    for raw in io.StringIO(stripped):
+        line = raw.strip()
+        if not line:
+            continue
+        if line[0] != "#":
+            if "://" in line or (fmt is not None and base_url):
+                # Bare relative lines only count once the body identified itself as M3U/HLS
+                entries.append(_PlaylistEntry(join(line), **pending))
+                fmt = fmt or "m3u"
+            pending = {}
+            continue
+        tag, _, value = line.partition(":")
+        tag = tag.upper()
+        if tag == "#EXTINF":
+            duration, _, title = value.partition(",")
+            try:
+                pending["duration"] = float(duration.split()[0])
+            except (ValueError, IndexError):
+                pass
+            pending["title"] = title.strip() or None
+        elif tag == "#EXTM3U":
+            fmt = fmt or "m3u"
+        elif tag == "#EXT-X-STREAM-INF":
+            fmt = "hls_master"
+            attrs = {k: v.strip('"') for k, v in _HLS_ATTR.findall(value)}
+            if attrs.get("BANDWIDTH", "").isdigit():
+                pending["bandwidth"] = int(attrs["BANDWIDTH"])
+            pending["codecs"] = attrs.get("CODECS")
+        elif tag in ("#EXT-X-TARGETDURATION", "#EXT-X-MEDIA-SEQUENCE"):
+            fmt = "hls_media"
+    return _Playlist(fmt, entries)
+
 @mcp.tool()
 async def get_playable_stream(url: str, ctx: Context = None) -> Dict[str, Any]:
     """
     Resolve a station URL (playlist/redirect) to a direct stream if possible.
     Always call this before play() if you aren’t sure the URL is a raw audio stream.
-    Returns: { input_url, resolved_url, content_type, notes[] }.
+    Returns: { input_url, resolved_url, content_type, codec?, bitrate?, sample_rate?, channels?, notes[] }
+    (bitrate in kbps). Codec fields are best-effort: they come only from GET probes, so a stream
+    whose host confirms audio/* on HEAD is returned without them; use measure_streams for its codec.
+    Results are cached (failures briefly); call report_stream_failure if a resolved URL won't play.
+    """
+    return await _get_playable_stream(url)
+
+@mcp.tool()
+async def get_playable_streams(urls: List[str], concurrency: int = 8, ctx: Context = None) -> List[Dict[str, Any]]:
     """
-    headers = {"User-Agent": APP_NAME, "Accept": "*/*"}
-    async with httpx.AsyncClient(headers=headers, timeout=20.0, follow_redirects=True) as client:
-        # HEAD probe
-        head = None
+    Resolve several station URLs at once (e.g. every `url` from find_station) instead of one call each.
+    At most `concurrency` resolutions run at a time; results share get_playable_stream's cache.
+    Returns one { url, ok, stream | error, elapsed_ms } per URL, in input order.
+    """
+    return await _gather_bounded(urls, _get_playable_stream, concurrency, key="url", field="stream")
+
+async def _get_playable_stream(url: str) -> Dict[str, Any]:
+    cached = _resolve_cache.get(url)
+    if cached is None:
+        # A fresh failure raises the original error here (and in every coalesced caller)
+        cached = await _singleflight(("get_playable_stream", url), lambda: _resolve_and_cache(url))
+    elif "error" in cached:
+        raise RuntimeError(f"Resolving {url} failed recently: {cached['error']}")
+    return copy.deepcopy(cached)
+
+async def _resolve_and_cache(url: str) -> Dict[str, Any]:
+    try:
+        result = await _resolve_stream(url)
+    except Exception as e:
+        _resolve_cache.put(url, {"error": _short_error(e)}, ttl=RESOLVE_CACHE_NEGATIVE_TTL)
+        raise
+    # Guesses ("Unrecognized content-type") only get the short TTL so they are retried soon
+    confirmed = not any(n.startswith(_UNRESOLVED_NOTE) for n in result["notes"])
+    _resolve_cache.put(url, result, ttl=RESOLVE_CACHE_TTL if confirmed else RESOLVE_CACHE_NEGATIVE_TTL)
+    return result
+
+@mcp.tool()
+async def report_stream_failure(url: str, ctx: Context = None) -> Dict[str, Any]:
+    """
+    Tell the server a stream URL failed to play so its cached resolution is dropped.
+    Accepts either the original station URL or the resolved URL; the next get_playable_stream re-probes.
+    """
+    return {"ok": True, "invalidated": _invalidate_resolution(url)}
+
+_UNRESOLVED_NOTE = "Unrecognized content-type"
+
+async def _resolve_stream(url: str) -> Dict[str, Any]:
+    headers = {"Accept": "*/*"}
+    client = _get_http_client()
+    notes: List[str] = []
+    caps = _host_caps.get(_host_key(url)) or {}
+
+    probe_url = url
+    if caps.get("https_redirect") and url.startswith("http://"):
+        # The upgrade target may be on another port (http://host:8000 -> https://host)
+        probe_url = caps["https_redirect"] + url[len("http://") + len(urlsplit(url).netloc):]
+        notes.append(f"host redirected to HTTPS before; probing {probe_url} directly")
+
+    # HEAD probe, skipped for hosts that reject it or that serve ICY streams (the GET is as cheap and sniffs the codec)
+    head = None
+    if caps.get("head_ok") is False or caps.get("icy"):
+        notes.append("skipping HEAD: " + ("host does not answer HEAD" if caps.get("head_ok") is False else "ICY stream host"))
+    else:
         try:
-            head = await client.head(url)
+            t0 = time.perf_counter()
+            async with _host_slot(probe_url):
+                head = await client.head(probe_url, headers=headers, timeout=PROBE_TIMEOUT)
+            _note_hop(notes, 0, "HEAD", head, t0)
+            _learn_host(head)
+            if head.status_code in (405, 501):
+                _learn_host(probe_url, head_ok=False)
+            elif head.status_code < 400 and "content-type" in head.headers:
+                _learn_host(probe_url, head_ok=True)
             if head.status_code >= 400:
+                # A 404/410 only says this path is gone, not that the host ignores HEAD
                 head = None
-        except Exception:
+        except httpx.HTTPError:
+            _learn_host(probe_url, head_ok=False)
             head = None
 
-        ct = head.headers.get("content-type") if head else None
-        notes: List[str] = []
-
-        if ct and any(t in ct for t in ["audio/", "application/ogg"]):
-            return {"input_url": url, "resolved_url": str(head.url) if head else url, "content_type": ct, "notes": notes}
-
-        # GET
-        r = await client.get(url)
-        r.raise_for_status()
-        ct = r.headers.get("content-type", "")
-        final_url = str(r.url)
-
-        if any(t in ct for t in ["audio/", "application/ogg"]):
-            return {"input_url": url, "resolved_url": final_url, "content_type": ct, "notes": notes}
-
-        # Try parse as playlist text
-        textish = ("text" in ct) or ("mpegurl" in ct) or ("pls" in ct)
-        if textish:
-            candidate = _parse_playlist(r.text)
-            if candidate:
-                rr = await client.get(candidate)
-                rr.raise_for_status()
-                ctt = rr.headers.get("content-type", "")
-                if any(t in ctt for t in ["audio/", "application/ogg"]):
-                    return {
-                        "input_url": url,
-                        "resolved_url": str(rr.url),
-                        "content_type": ctt,
-                        "notes": ["Resolved from playlist"],
-                    }
-
-        notes.append(f"Unrecognized content-type: {ct or 'unknown'}; returning final URL anyway.")
-        return {"input_url": url, "resolved_url": final_url, "content_type": ct or "unknown", "notes": notes}
+    ct = head.headers.get("content-type") if head else None
+    if _is_audio_type(ct):
+        return {"input_url": url, "resolved_url": str(head.url), "content_type": ct, "notes": notes}
+
+    top: Dict[str, str] = {}
+    try:
+        found = await _follow_stream(probe_url, headers, 0, set(), notes, top)
+    except httpx.HTTPError as e:
+        if probe_url == url:
+            raise
+        # The learned HTTPS upgrade went stale; forget it and take the original URL
+        _host_caps.invalidate(_host_key(url))
+        notes.append(f"HTTPS probe failed ({_short_error(e)}); retrying {url}")
+        found = await _follow_stream(url, headers, 0, set(), notes, top)
+    if found:
+        resolved_url, ct, audio = found
+        if head is not None and resolved_url == top.get("url") and _is_audio_type(ct):
+            # HEAD answered with a non-audio type for what GET shows is a stream: it only costs a round trip here
+            _learn_host(probe_url, head_ok=False)
+        return {"input_url": url, "resolved_url": resolved_url, "content_type": ct, **audio, "notes": notes}
+
+    ct = top.get("content_type", "")
+    notes.append(f"{_UNRESOLVED_NOTE}: {ct or 'unknown'}; returning final URL anyway.")
+    return {"input_url": url, "resolved_url": top.get("url", url), "content_type": ct or "unknown", "notes": notes}
+
+def _host_key(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+def _learn_host(source: Union[str, httpx.Response], **caps: Any) -> None:
+    """
+    Merge capabilities into _host_caps. Given a response, also record which hosts redirected
+    http:// to https:// on the same host (as the https origin they redirected to) and whether
+    the final host speaks ICY.
+    """
+    def merge(key: str, update: Dict[str, Any]) -> None:
+        if key:
+            _host_caps.put(key, {**(_host_caps.peek(key) or {}), **update})
+
+    if isinstance(source, str):
+        merge(_host_key(source), caps)
+        return
+    urls = [h.url for h in source.history] + [source.url]
+    for a, b in zip(urls, urls[1:]):
+        if a.scheme == "http" and b.scheme == "https" and a.host == b.host:
+            merge(_host_key(str(a)), {"https_redirect": "https://" + _host_key(str(b))})
+    if source.request.method == "GET":
+        caps.setdefault("icy", any(k.lower().startswith("icy-") for k in source.headers))
+    if caps:
+        merge(_host_key(str(source.url)), caps)
+
+def _note_hop(notes: List[str], depth: int, method: str, r: httpx.Response, t0: float) -> None:
+    """Record each redirect and the final response of one request, with its latency."""
+    for h in r.history:
+        notes.append(f"hop {depth}: {method} {h.url} -> {h.status_code} redirect")
+    ms = (time.perf_counter() - t0) * 1000
+    ct = r.headers.get("content-type") or "no content-type"
+    notes.append(f"hop {depth}: {method} {r.url} -> {r.status_code} {ct} ({ms:.0f} ms)")
+
+async def _follow_stream(
+    url: str,
+    headers: Dict[str, str],
+    depth: int,
+    seen: set,
+    notes: List[str],
+    top: Optional[Dict[str, str]] = None,
+) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Follow redirects and nested playlists (PLS -> M3U -> HLS ...) until a response with an audio
+    content type (or an HLS media playlist) is confirmed; a playlist's entries are raced with
+    _race_staggered and the first to confirm wins. Bodies are sniffed, so MP3/AAC/Ogg served as
+    octet-stream or text/html still count. Returns (url, content_type, {codec, bitrate, sample_rate}).
+    URLs already visited are skipped, and nesting stops at RESOLVE_MAX_DEPTH. Errors on the input
+    URL propagate; errors on nested entries are noted and the next entry is tried.
+    """
+    if url in seen:
+        notes.append(f"hop {depth}: {url} already visited; skipping loop")
+        return None
+    seen.add(url)
+    t0 = time.perf_counter()
+    try:
+        # Streamed GET: headers plus a small prefix only, never the (possibly endless) audio body
+        r = await _probe_get(url, headers)
+        _note_hop(notes, depth, "GET", r.response, t0)
+        _learn_host(r.response)
+        r.response.raise_for_status()
+    except httpx.HTTPError as e:
+        if depth == 0:
+            raise
+        if not isinstance(e, httpx.HTTPStatusError):
+            notes.append(f"hop {depth}: GET {url} failed: {_short_error(e)}")
+        return None
+    seen.update(str(h.url) for h in r.response.history)
+    seen.add(r.url)
+    ct = r.content_type
+    if top is not None:
+        top.update(url=r.url, content_type=ct)
+
+    sniffed = _sniff_audio(r.body)
+    if sniffed:
+        mime = sniffed.pop("mime")
+        if not _is_audio_type(ct):
+            notes.append(f"hop {depth}: body sniffed as {sniffed.get('codec') or mime} despite content-type {ct or 'none'}")
+            ct = mime
+        return r.url, ct, sniffed
+    if _is_audio_type(ct):
+        return r.url, ct, {}
+    if not (_is_playlist_type(ct) or "text" in ct):
+        return None
+    playlist = _parse_playlist(r.text(), r.url)
+    if playlist.format == "hls_media":
+        return r.url, ct, {}
+    if depth >= RESOLVE_MAX_DEPTH:
+        notes.append(f"hop {depth}: max playlist depth {RESOLVE_MAX_DEPTH} reached")
+        return None
+    entries = [e for e in playlist.entries if e.url.startswith(("http://", "https://"))][:PLAYLIST_MAX_CANDIDATES]
+    if not entries:
+        return None
+    notes.append(f"hop {depth}: {playlist.format or 'playlist'} with {len(entries)} candidate(s)")
+    # Race the candidates with a stagger so one dead mirror costs RESOLVE_RACE_STAGGER, not a full timeout;
+    # each branch keeps its own notes so they read in playlist order afterwards
+    branch_notes: List[List[str]] = [[] for _ in entries]
+
+    def attempt(i: int) -> Callable[[], Awaitable[Optional[Tuple[str, str, Dict[str, Any]]]]]:
+        async def run() -> Optional[Tuple[str, str, Dict[str, Any]]]:
+            try:
+                return await _follow_stream(entries[i].url, headers, depth + 1, seen, branch_notes[i])
+            except Exception as e:
+                branch_notes[i].append(f"hop {depth + 1}: {entries[i].url} failed: {_short_error(e)}")
+                return None
+        return run
+
+    won = await _race_staggered([attempt(i) for i in range(len(entries))], RESOLVE_RACE_STAGGER)
+    for entry, bn in zip(entries, branch_notes):
+        notes.extend(bn or [f"hop {depth + 1}: {entry.url} abandoned, another candidate answered first"])
+    if won is None:
+        return None
+    # Hand players the adaptive master rather than the one variant we checked
+    return (r.url, ct, {}) if playlist.format == "hls_master" else won[1]
+
+# -------- Now playing (ICY metadata) --------
+
+# Give up on servers whose metadata interval would make us download a large chunk of audio
+ICY_MAX_METAINT = 256 * 1024
+ICY_MAX_BLOCKS = 2  # an empty first block means "unchanged"; the next one usually carries the title
+_ICY_FIELD = re.compile(r"(\w+)='(.*?)';", re.DOTALL)
+
+@mcp.tool()
+async def now_playing(urls: List[str], concurrency: int = 8, ctx: Context = None) -> List[Dict[str, Any]]:
+    """
+    Read the current track title (ICY StreamTitle) of one or more streams without playing them.
+    Pass resolved stream URLs (from get_playable_stream). Only a few KB of audio are read per station.
+    Returns one { url, ok, title?, artist?, song?, station?, bytes_read | error, elapsed_ms } per URL, in input order.
+    """
+    return await _gather_bounded(urls, _read_icy_title, concurrency, key="url", field=None)
+
+async def _read_icy_title(url: str) -> Dict[str, Any]:
+    """
+    Ask for in-band metadata (Icy-MetaData: 1), skip icy-metaint bytes of audio and decode the metadata
+    block that follows, then drop the connection. Audio chunks are sliced with memoryview, never copied.
+    """
+    client = _get_http_client()
+    async with _host_slot(url):
+        async with client.stream("GET", url, headers={"Icy-MetaData": "1", "Accept": "*/*"}, timeout=PROBE_TIMEOUT) as r:
+            r.raise_for_status()
+            info: Dict[str, Any] = {}
+            if r.headers.get("icy-name"):
+                info["station"] = r.headers["icy-name"]
+            try:
+                metaint = int(r.headers.get("icy-metaint", ""))
+            except ValueError:
+                metaint = 0
+            if not 0 < metaint <= ICY_MAX_METAINT:
+                info["title"] = None
+                info["note"] = "Stream does not send ICY metadata." if not metaint else f"icy-metaint {metaint} too large."
+                return info
+
+            skip, meta_len, blocks, read = metaint, -1, 0, 0
+            meta = bytearray()
+            done = False
+            async for chunk in r.aiter_bytes():
+                read += len(chunk)
+                view = memoryview(chunk)
+                while view and not done:
+                    if skip:
+                        n = min(skip, len(view))
+                        skip -= n
+                        view = view[n:]
+                    elif meta_len < 0:
+                        meta_len = view[0] * 16
+                        view = view[1:]
+                    else:
+                        n = min(meta_len - len(meta), len(view))
+                        meta += view[:n]
+                        view = view[n:]
+                    if meta_len >= 0 and len(meta) == meta_len:
+                        blocks += 1
+                        if meta_len or blocks >= ICY_MAX_BLOCKS:
+                            done = True
+                        else:
+                            skip, meta_len = metaint, -1
+                if done:
+                    break
+            info["bytes_read"] = read
+    info.update(_parse_icy_metadata(bytes(meta)))
+    return info
+
+def _parse_icy_metadata(raw: bytes) -> Dict[str, Any]:
+    """Decode a StreamTitle='...';StreamUrl='...'; block (UTF-8, falling back to Latin-1)."""
+    raw = raw.rstrip(b"\0")
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        text = raw.decode("latin-1")
+    fields = dict(_ICY_FIELD.findall(text))
+    title = fields.get("StreamTitle", "").strip() or None
+    out: Dict[str, Any] = {"title": title}
+    if title and " - " in title:
+        out["artist"], out["song"] = (p.strip() for p in title.split(" - ", 1))
+    if fields.get("StreamUrl"):
+        out["stream_url"] = fields["StreamUrl"]
+    return out
+
+# -------- Stream measurement --------
+
+MEASURE_MAX_SECONDS = 10.0
+MEASURE_MAX_BYTES = 4 * 1024 * 1024  # stop early on links fast enough to pull this in the window
+MEASURE_STALL_GRACE = 1.0  # seconds past the window before a silent stream counts as stalled
+MEASURE_FIRST_BYTE_TIMEOUT = 10.0
+
+@mcp.tool()
+async def measure_streams(
+    urls: List[str], seconds: float = 3.0, concurrency: int = 4, ctx: Context = None
+) -> List[Dict[str, Any]]:
+    """
+    Measure how quickly streams start and whether they keep up, to choose between candidate stations.
+    Each URL is read for `seconds` (max 10): connect/TLS time, time to headers and first audio byte,
+    throughput in kbps, the longest gap between chunks, and realtime_ratio (throughput / codec bitrate,
+    below ~1.0 means the stream will stutter). Pass resolved stream URLs (from get_playable_stream).
+    Returns one { url, ok, ... | error, elapsed_ms } per URL, in input order.
+    """
+    seconds = max(0.5, min(seconds, MEASURE_MAX_SECONDS))
+    return await _gather_bounded(urls, lambda u: _measure_stream(u, seconds), concurrency, key="url", field=None)
+
+async def _measure_stream(url: str, seconds: float) -> Dict[str, Any]:
+    """
+    GET the stream for a fixed window, timing connection setup through httpx's trace extension
+    (absent when a pooled connection is reused) and counting bytes as they arrive.
+    """
+    marks: Dict[str, float] = {}
+
+    async def trace(event: str, info: Dict[str, Any]) -> None:
+        # e.g. connection.connect_tcp.started, http11.receive_response_headers.complete; last hop wins
+        marks[event.split(".", 1)[1] if event.startswith(("http11.", "http2.")) else event] = time.perf_counter()
+
+    def span(start: str, end: str) -> Optional[float]:
+        if start in marks and end in marks:
+            return round((marks[end] - marks[start]) * 1000, 1)
+        return None
+
+    client = _get_http_client()
+    async with _host_slot(url):
+        t0 = time.perf_counter()
+        async with client.stream(
+            "GET", url, headers={"Accept": "*/*"}, timeout=PROBE_TIMEOUT, extensions={"trace": trace}
+        ) as r:
+            t_headers = time.perf_counter()
+            r.raise_for_status()
+            state = {"bytes": 0, "first": None, "last": None, "max_gap": 0.0}
+            head = bytearray()
+
+            def take(chunk: bytes) -> bool:
+                """Count one chunk; True once the window is over or the byte cap is reached."""
+                now = time.perf_counter()
+                if state["first"] is None:
+                    state["first"] = now
+                else:
+                    state["max_gap"] = max(state["max_gap"], now - state["last"])
+                state["last"] = now
+                state["bytes"] += len(chunk)
+                if len(head) < SNIFF_MAX_BYTES:
+                    head.extend(chunk[: SNIFF_MAX_BYTES - len(head)])
+                return now - state["first"] >= seconds or state["bytes"] >= MEASURE_MAX_BYTES
+
+            async def consume(chunks: AsyncIterator[bytes]) -> None:
+                async for chunk in chunks:
+                    if take(chunk):
+                        return
+
+            chunks = r.aiter_raw()
+            stalled = False
+            try:
+                # Time to first byte has its own limit; the sampling window only starts once data flows
+                first_chunk = await asyncio.wait_for(chunks.__anext__(), timeout=MEASURE_FIRST_BYTE_TIMEOUT)
+            except (StopAsyncIteration, asyncio.TimeoutError):
+                first_chunk = None
+            if first_chunk is not None and not take(first_chunk):
+                try:
+                    # A stalled stream would otherwise hold us for the full read timeout
+                    await asyncio.wait_for(consume(chunks), timeout=seconds + MEASURE_STALL_GRACE)
+                except asyncio.TimeoutError:
+                    stalled = True
+            t_end = time.perf_counter()
+
+    out: Dict[str, Any] = {
+        "content_type": r.headers.get("content-type", ""),
+        "reused_connection": "connection.connect_tcp.started" not in marks,
+        "connect_ms": span("connection.connect_tcp.started", "connection.connect_tcp.complete"),
+        "tls_ms": span("connection.start_tls.started", "connection.start_tls.complete"),
+        "server_ms": span("send_request_headers.started", "receive_response_headers.complete"),
+        "headers_ms": round((t_headers - t0) * 1000, 1),
+        "redirects": len(r.history),
+    }
+    first, last = state["first"], state["last"]
+    if first is None:
+        out.update(first_byte_ms=None, bytes=0, throughput_kbps=0.0, stalled=True)
+        return out
+    out["first_byte_ms"] = round((first - t0) * 1000, 1)
+    window = max(t_end - first, 1e-3)
+    out["bytes"] = state["bytes"]
+    out["throughput_kbps"] = round(state["bytes"] * 8 / window / 1000, 1)
+    out["max_gap_ms"] = round(max(state["max_gap"], t_end - last if stalled else 0.0) * 1000, 1)
+    out["stalled"] = stalled
+    audio = _sniff_audio(bytes(head)) or {}
+    if audio.get("codec"):
+        out["codec"] = audio["codec"]
+    if audio.get("bitrate"):
+        out["bitrate"] = audio["bitrate"]
+        out["realtime_ratio"] = round(out["throughput_kbps"] / audio["bitrate"], 2)
+    return out
 
 # -------- Playback helpers --------
 
@@ -167,59 +1830,242 @@ def _detect_vlc_path(vlc_path: Optional[str]) -> Optional[str]:
 
 # ---------- VLC RC control helpers ----------
 
-def _send_vlc_rc(host: str, port: int, commands: List[str], timeout: float = 1.5) -> Dict[str, Any]:
+RC_TIMEOUT = float(os.environ.get("MCP_RADIO_RC_TIMEOUT", "2.0"))
+RC_SESSION_IDLE = float(os.environ.get("MCP_RADIO_RC_SESSION_IDLE", "60"))
+_RC_PROMPT = b"> "
+
+async def _rc_read_reply(reader: asyncio.StreamReader) -> str:
     """
-    Send one or more RC commands to VLC (TCP). Returns raw response text.
+    Read one RC reply: everything up to VLC's "> " prompt, which follows the banner and every command.
+    The prompt starts a line, so a "> " inside a title doesn't end the reply, and replies to
+    pipelined commands that arrive in the same packet stay separate.
     """
-    buf = b""
-    try:
-        with socket.create_connection((host, port), timeout=timeout) as s:
-            s.settimeout(timeout)
-            # Read initial banner/prompt if any (non-fatal if it times out)
+    buf = bytearray()
+    while True:
+        try:
+            buf += await reader.readuntil(_RC_PROMPT)
+        except asyncio.IncompleteReadError as e:
+            raise ConnectionError("VLC closed the RC connection") from e
+        body = buf[: -len(_RC_PROMPT)]
+        if not body or body.endswith(b"\n"):
+            return body.decode("utf-8", errors="replace")
+
+class _RCSession:
+    """
+    One long-lived RC connection to a VLC instance. Commands are serialized by a lock, a dead or
+    desynchronized connection is replaced on next use, and an idle connection is closed after
+    RC_SESSION_IDLE seconds (VLC's RC interface serves one client at a time).
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.lock = asyncio.Lock()
+        self.connects = 0
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._idle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing() and not self._reader.at_eof()
+
+    async def _connect(self, timeout: float) -> None:
+        self.close()
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout)
+        self.connects += 1
+        await asyncio.wait_for(_rc_read_reply(self._reader), timeout)  # banner
+
+    async def _exchange(self, commands: List[str], timeout: float, pipeline: bool, replies: List[str]) -> None:
+        if pipeline:
+            # All commands in one write; VLC answers them in order, each reply ending in a prompt
+            self._writer.write("".join(cmd.strip() + "\n" for cmd in commands).encode("utf-8"))
+        for cmd in commands:
+            if not pipeline:
+                self._writer.write((cmd.strip() + "\n").encode("utf-8"))
+            replies.append(await asyncio.wait_for(_rc_read_reply(self._reader), timeout))
+
+    async def run(self, commands: List[str], timeout: float = RC_TIMEOUT, pipeline: bool = False) -> List[str]:
+        """
+        Send commands on this session and return one reply per command, in order.
+        pipeline=True writes them all at once instead of waiting for each reply before the next command.
+        """
+        async with self.lock:
+            if self._idle is not None:
+                self._idle.cancel()
             try:
-                buf += s.recv(4096)
-            except Exception:
-                pass
-            for cmd in commands:
-                s.sendall((cmd.strip() + "\n").encode("utf-8"))
-                try:
-                    buf += s.recv(8192)
-                except Exception:
-                    # Some commands don't respond immediately; ignore
-                    pass
-            # Send 'status' at end to force output if nothing returned
-            if not buf:
+                fresh = not self.connected
+                if fresh:
+                    await self._connect(timeout)
+                replies: List[str] = []
                 try:
-                    s.sendall(b"status\n")
-                    buf += s.recv(8192)
-                except Exception:
-                    pass
-        return {"ok": True, "response": buf.decode(errors="replace")}
+                    await self._exchange(commands, timeout, pipeline, replies)
+                except ConnectionError:
+                    if replies or fresh:
+                        raise
+                    # VLC restarted behind a pooled connection: nothing reached it
+                    await self._connect(timeout)
+                    await self._exchange(commands, timeout, pipeline, replies)
+                return replies
+            except BaseException:
+                self.close()  # a half-read reply would desync every later command
+                raise
+            finally:
+                if self._writer is not None:
+                    self._idle = asyncio.get_running_loop().call_later(RC_SESSION_IDLE, self.close)
+
+    def close(self) -> None:
+        if self._idle is not None:
+            self._idle.cancel()
+            self._idle = None
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+_rc_sessions: Dict[Tuple[str, int], _RCSession] = {}
+
+def _rc_session(host: str, port: int) -> _RCSession:
+    key = (host.lower(), port)
+    session = _rc_sessions.get(key)
+    if session is None:
+        session = _rc_sessions[key] = _RCSession(host, port)
+    return session
+
+def _close_rc_sessions() -> None:
+    for session in _rc_sessions.values():
+        session.close()
+    _rc_sessions.clear()
+
+async def _send_vlc_rc(host: str, port: int, commands: List[str], timeout: float = RC_TIMEOUT) -> Dict[str, Any]:
+    """
+    Send one or more RC commands to VLC over its pooled session. Each reply is framed by the
+    prompt rather than a recv timeout. Returns the raw response text.
+    """
+    session = _rc_session(host, port)
+    try:
+        replies = await session.run(commands, timeout)
+        # Send 'status' at end to force output if nothing returned
+        if not any(r.strip() for r in replies):
+            replies += await session.run(["status"], timeout)
+        return {"ok": True, "response": "".join(replies)}
     except Exception as e:
         return {"ok": False, "error": repr(e)}
 
+# ---------- VLC RC output parsing ----------
+
+_RC_STATUS_LINE = re.compile(r"^(?:status change: )?\( (new input|audio volume|state):? ?(.*?) ?\)\s*$", re.MULTILINE)
+_RC_INFO_SECTION = re.compile(r"^\+-+\[ (.*?) \]", re.MULTILINE)
+_RC_KV_LINE = re.compile(r"^\| ([^:\r\n]+?)[ \t]*:[ \t]*(.*?)\s*$", re.MULTILINE)
+_RC_NUMBER = re.compile(r"^(-?\d+(?:\.\d+)?)\s*(\S*)$")
+_RC_UNIT_BYTES = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3}
+
+def _rc_key(label: str) -> str:
+    return re.sub(r"\W+", "_", label.strip().lower()).strip("_")
+
+def _rc_value(key: str, value: str) -> Tuple[str, Any]:
+    """Convert '44100 Hz', '128 kb/s', '1234 KiB' or '7' to a number, renaming the key after its unit."""
+    m = _RC_NUMBER.match(value)
+    if not m:
+        return key, value
+    number, unit = float(m.group(1)), m.group(2)
+    if unit in _RC_UNIT_BYTES:
+        return key, int(number * _RC_UNIT_BYTES[unit])
+    if unit == "kb/s":
+        key += "_kbps"
+    elif unit not in ("", "Hz"):
+        return key, value
+    return key, int(number) if number.is_integer() else number
+
+def _volume_percent(level: int) -> int:
+    # Same 0..512 <-> 0..100 mapping vlc_volume_set uses
+    return int(round(level / 5.12))
+
+def _parse_rc_status(text: str) -> Dict[str, Any]:
+    """'( new input: URL )', '( audio volume: 256 )', '( state playing )' -> {input, volume, volume_percent, state}."""
+    out: Dict[str, Any] = {}
+    for field, value in _RC_STATUS_LINE.findall(text):
+        if field == "new input":
+            out["input"] = value
+        elif field == "audio volume":
+            try:
+                out["volume"] = int(float(value))
+            except ValueError:
+                continue
+            out["volume_percent"] = _volume_percent(out["volume"])
+        else:
+            out["state"] = value
+    return out
+
+def _parse_rc_info(text: str) -> Dict[str, Any]:
+    """'+----[ Stream 0 ]' sections of '| Key: Value' lines -> {meta: {...}, streams: [{type, codec, ...}]}."""
+    out: Dict[str, Any] = {"meta": {}, "streams": []}
+    sections = list(_RC_INFO_SECTION.finditer(text))
+    for i, sec in enumerate(sections):
+        body = text[sec.end(): sections[i + 1].start() if i + 1 < len(sections) else len(text)]
+        fields = dict(_rc_value(_rc_key(k), v) for k, v in _RC_KV_LINE.findall(body))
+        name = sec.group(1)
+        if name.lower().startswith("stream "):
+            fields["index"] = int(name.split()[1]) if name.split()[1].isdigit() else name
+            if isinstance(fields.get("type"), str):
+                fields["type"] = fields["type"].lower()
+            out["streams"].append(fields)
+        elif name.lower().startswith("meta"):
+            out["meta"] = {k: v for k, v in _RC_KV_LINE.findall(body)}
+    return out
+
+def _parse_rc_stats(text: str) -> Dict[str, Any]:
+    """'| input bitrate : 128 kb/s' lines -> {input_bitrate_kbps: 128, input_bytes_read: ..., buffers_lost: ...}."""
+    return dict(_rc_value(_rc_key(k), v) for k, v in _RC_KV_LINE.findall(text))
+
+def _parse_rc_number(text: str) -> Optional[int]:
+    """get_time / get_length reply -> seconds (None when nothing is playing)."""
+    text = text.strip()
+    return int(text) if text.lstrip("-").isdigit() else None
+
+def _rc_result(res: Dict[str, Any], parsed: Dict[str, Any], raw: bool) -> Dict[str, Any]:
+    out = {"ok": True, **parsed}
+    if raw:
+        out["response"] = res["response"]
+    return out
+
+async def _vlc_query(
+    host: str, port: int, commands: List[str], parse: Callable[[List[str]], Dict[str, Any]], raw: bool
+) -> Dict[str, Any]:
+    """Run commands on the RC session and return parse(replies), plus the raw text when raw=True."""
+    try:
+        replies = await _rc_session(host, port).run(commands)
+    except Exception as e:
+        return {"ok": False, "error": repr(e)}
+    return _rc_result({"response": "".join(replies)}, parse(replies), raw)
+
+async def _vlc_command(host: str, port: int, commands: List[str], raw: bool) -> Dict[str, Any]:
+    res = await _send_vlc_rc(host, port, commands)
+    if not res["ok"]:
+        return res
+    return _rc_result(res, _parse_rc_status(res["response"]), raw)
+
 @mcp.tool()
-async def vlc_pause(rc_host: str = "127.0.0.1", rc_port: int = 4212, ctx: Context=None) -> Dict[str, Any]:
+async def vlc_pause(rc_host: str = "127.0.0.1", rc_port: int = 4212, raw: bool = False, ctx: Context=None) -> Dict[str, Any]:
     """Toggle pause/play on VLC (RC)."""
-    return _send_vlc_rc(rc_host, rc_port, ["pause"])
+    return await _vlc_command(rc_host, rc_port, ["pause"], raw)
 
 @mcp.tool()
-async def vlc_stop(rc_host: str = "127.0.0.1", rc_port: int = 4212, ctx: Context=None) -> Dict[str, Any]:
+async def vlc_stop(rc_host: str = "127.0.0.1", rc_port: int = 4212, raw: bool = False, ctx: Context=None) -> Dict[str, Any]:
     """Stop playback in VLC (RC)."""
-    return _send_vlc_rc(rc_host, rc_port, ["stop"])
+    return await _vlc_command(rc_host, rc_port, ["stop"], raw)
 
 @mcp.tool()
-async def vlc_volume_set(percent: int, rc_host: str = "127.0.0.1", rc_port: int = 4212, ctx: Context=None) -> Dict[str, Any]:
+async def vlc_volume_set(percent: int, rc_host: str = "127.0.0.1", rc_port: int = 4212, raw: bool = False, ctx: Context=None) -> Dict[str, Any]:
     """
     Set VLC volume (0–100). Internally maps to VLC's 0–512 scale.
     """
     p = max(0, min(100, percent))
     # VLC RC volume is 0..512; map linearly
     level = int(round(p * 5.12))
-    return _send_vlc_rc(rc_host, rc_port, [f"volume {level}", "status"])
+    return await _vlc_command(rc_host, rc_port, [f"volume {level}", "status"], raw)
 
 @mcp.tool()
-async def vlc_volume_change(delta: int, rc_host: str = "127.0.0.1", rc_port: int = 4212, ctx: Context=None) -> Dict[str, Any]:
+async def vlc_volume_change(delta: int, rc_host: str = "127.0.0.1", rc_port: int = 4212, raw: bool = False, ctx: Context=None) -> Dict[str, Any]:
     """
     Change volume by +/- percent. Positive raises, negative lowers.
     """
@@ -231,12 +2077,219 @@ async def vlc_volume_change(delta: int, rc_host: str = "127.0.0.1", rc_port: int
         steps = max(1, int(round(abs(delta) / 1.56)))
         cmds = [f"voldown {steps}"]
     cmds.append("status")
-    return _send_vlc_rc(rc_host, rc_port, cmds)
+    return await _vlc_command(rc_host, rc_port, cmds, raw)
 
 @mcp.tool()
-async def vlc_status(rc_host: str = "127.0.0.1", rc_port: int = 4212, ctx: Context=None) -> Dict[str, Any]:
-    """Return VLC RC 'status' output."""
-    return _send_vlc_rc(rc_host, rc_port, ["status"])
+async def vlc_status(rc_host: str = "127.0.0.1", rc_port: int = 4212, raw: bool = False, ctx: Context=None) -> Dict[str, Any]:
+    """
+    Return VLC's playback status as { state, input, volume, volume_percent, time_s, length_s, title }.
+    raw=True also returns the RC text.
+    """
+    def parse(replies: List[str]) -> Dict[str, Any]:
+        out = _parse_rc_status(replies[0])
+        out["time_s"] = _parse_rc_number(replies[1])
+        out["length_s"] = _parse_rc_number(replies[2])
+        out["title"] = replies[3].strip() or None
+        return out
+    return await _vlc_query(rc_host, rc_port, ["status", "get_time", "get_length", "get_title"], parse, raw)
+
+@mcp.tool()
+async def vlc_info(rc_host: str = "127.0.0.1", rc_port: int = 4212, raw: bool = False, ctx: Context=None) -> Dict[str, Any]:
+    """
+    Return metadata and per-stream details (codec, sample_rate, bitrate_kbps, channels) of VLC's current input.
+    raw=True also returns the RC text.
+    """
+    return await _vlc_query(rc_host, rc_port, ["info"], lambda r: _parse_rc_info(r[0]), raw)
+
+@mcp.tool()
+async def vlc_stats(rc_host: str = "127.0.0.1", rc_port: int = 4212, raw: bool = False, ctx: Context=None) -> Dict[str, Any]:
+    """
+    Return VLC's input/demux/decoder counters (bytes read, bitrates in kbps, corrupted, lost buffers ...).
+    Rising buffers_lost or discontinuities mean the stream is stuttering. raw=True also returns the RC text.
+    """
+    return await _vlc_query(rc_host, rc_port, ["stats"], lambda r: _parse_rc_stats(r[0]), raw)
+
+RC_BATCH_MAX_COMMANDS = 64
+
+def _parse_rc_reply(command: str, text: str) -> Dict[str, Any]:
+    """Structured form of one command's reply, picked by the command's verb."""
+    verb, _, arg = command.strip().partition(" ")
+    verb = verb.lower()
+    if text.lstrip().startswith("Unknown command"):
+        return {"ok": False, "error": text.strip()}
+    if verb == "info":
+        return _parse_rc_info(text)
+    if verb == "stats":
+        return _parse_rc_stats(text)
+    if verb in ("get_time", "get_length"):
+        return {"seconds": _parse_rc_number(text)}
+    if verb == "get_title":
+        return {"title": text.strip() or None}
+    if verb == "is_playing":
+        return {"playing": text.strip() == "1"}
+    if verb == "volume" and not arg and text.strip().isdigit():
+        return {"volume": int(text), "volume_percent": _volume_percent(int(text))}
+    parsed = _parse_rc_status(text)
+    if not parsed and text.strip():
+        parsed["output"] = text.strip()
+    return parsed
+
+@mcp.tool()
+async def vlc_batch(
+    commands: List[str], rc_host: str = "127.0.0.1", rc_port: int = 4212, raw: bool = False, ctx: Context = None
+) -> Dict[str, Any]:
+    """
+    Send several VLC RC commands in one round trip, e.g. ["volume 256", "seek 30", "status"].
+    Commands are pipelined over one connection and run in order (max 64).
+    Returns { ok, elapsed_ms, results: [{ command, ok, ...parsed fields }] }; raw=True adds each reply's text.
+    """
+    if not commands:
+        return {"ok": True, "elapsed_ms": 0.0, "results": []}
+    if len(commands) > RC_BATCH_MAX_COMMANDS:
+        return {"ok": False, "error": f"At most {RC_BATCH_MAX_COMMANDS} commands per batch."}
+    bad = [c for c in commands if not c.strip() or "\n" in c or "\r" in c]
+    if bad:
+        return {"ok": False, "error": f"Commands must be single, non-empty lines: {bad!r}"}
+    t0 = time.perf_counter()
+    try:
+        replies = await _rc_session(rc_host, rc_port).run(commands, pipeline=True)
+    except Exception as e:
+        return {"ok": False, "error": repr(e)}
+    results = []
+    for cmd, reply in zip(commands, replies):
+        item = {"command": cmd, "ok": True, **_parse_rc_reply(cmd, reply)}
+        if raw:
+            item["response"] = reply
+        results.append(item)
+    return {
+        "ok": all(r["ok"] for r in results),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+        "results": results,
+    }
+
+# ---------- VLC playback watcher ----------
+
+RC_WATCH_MIN_INTERVAL = 0.25
+RC_WATCH_STALL_SECONDS = 3.0  # "playing" with get_time frozen this long is reported as buffering
+
+class _RCWatcher:
+    """
+    Polls one VLC instance (status, get_time and get_title pipelined on its RC session) and pushes
+    each transition to every subscribed MCP session as a log notification from logger "vlc".
+    Runs only while it has subscribers.
+    """
+
+    def __init__(self, host: str, port: int, interval: float):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.subscribers: Dict[int, Any] = {}  # id(ServerSession) -> ServerSession
+        self.last: Dict[str, Any] = {}
+        self._time_moved_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self.last = {}  # the first poll then greets subscribers with a full "watching" snapshot
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        self.subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _poll(self) -> Dict[str, Any]:
+        try:
+            replies = await _rc_session(self.host, self.port).run(["status", "get_time", "get_title"], pipeline=True)
+        except Exception as e:
+            return {"state": "unreachable", "error": _short_error(e)}
+        snap = _parse_rc_status(replies[0])
+        snap["time_s"] = _parse_rc_number(replies[1])
+        snap["title"] = replies[2].strip() or None
+        now = time.monotonic()
+        if snap["time_s"] != self.last.get("time_s") or snap.get("state") != "playing":
+            self._time_moved_at = now
+        elif now - self._time_moved_at >= RC_WATCH_STALL_SECONDS:
+            snap["state"] = "buffering"
+        return snap
+
+    def _events(self, old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not old:
+            return [{"event": "watching", **new}]
+        events = []
+        if new.get("state") != old.get("state"):
+            events.append({"event": "state", "state": new.get("state"), "previous": old.get("state")})
+            if new.get("error"):
+                events[-1]["error"] = new["error"]
+        for field in ("input", "title"):
+            if new.get("state") != "unreachable" and new.get(field) != old.get(field):
+                events.append({"event": field, field: new.get(field), "previous": old.get(field)})
+        return events
+
+    async def _notify(self, event: Dict[str, Any]) -> None:
+        event = {"rc": f"{self.host}:{self.port}", **event}
+        level = "warning" if event.get("state") in ("unreachable", "buffering") else "info"
+        for key, session in list(self.subscribers.items()):
+            try:
+                await session.send_log_message(level=level, data=event, logger="vlc")
+            except Exception:
+                self.subscribers.pop(key, None)  # client went away
+
+    async def _run(self) -> None:
+        while self.subscribers:
+            snap = await self._poll()
+            if snap.get("state") == "unreachable" and self.last.get("state") == "unreachable":
+                snap = self.last  # keep one notification per outage, not one per poll
+            for event in self._events(self.last, snap):
+                await self._notify(event)
+            self.last = snap
+            await asyncio.sleep(self.interval)
+
+_rc_watchers: Dict[Tuple[str, int], _RCWatcher] = {}
+
+async def _stop_rc_watchers() -> None:
+    for watcher in _rc_watchers.values():
+        await watcher.stop()
+    _rc_watchers.clear()
+
+@mcp.tool()
+async def vlc_watch(
+    rc_host: str = "127.0.0.1", rc_port: int = 4212, interval: float = 1.0, ctx: Context = None
+) -> Dict[str, Any]:
+    """
+    Subscribe to VLC playback events instead of polling vlc_status.
+    Transitions arrive as MCP log notifications (logger "vlc") until vlc_unwatch:
+    state (playing/paused/stopped/opening/buffering/unreachable), input changed, title changed.
+    """
+    if ctx is None:
+        return {"ok": False, "error": "vlc_watch needs an MCP client session to notify."}
+    key = (rc_host.lower(), rc_port)
+    watcher = _rc_watchers.get(key)
+    if watcher is None:
+        watcher = _rc_watchers[key] = _RCWatcher(rc_host, rc_port, interval)
+    watcher.interval = max(RC_WATCH_MIN_INTERVAL, interval)
+    watcher.subscribers[id(ctx.session)] = ctx.session
+    watcher.start()
+    return {
+        "ok": True,
+        "watching": f"{rc_host}:{rc_port}",
+        "interval_s": watcher.interval,
+        "subscribers": len(watcher.subscribers),
+        "last": watcher.last or None,
+    }
+
+@mcp.tool()
+async def vlc_unwatch(rc_host: str = "127.0.0.1", rc_port: int = 4212, ctx: Context = None) -> Dict[str, Any]:
+    """Stop the playback events started by vlc_watch for this client."""
+    key = (rc_host.lower(), rc_port)
+    watcher = _rc_watchers.get(key)
+    was_watching = watcher is not None and ctx is not None and watcher.subscribers.pop(id(ctx.session), None) is not None
+    if watcher is not None and not watcher.subscribers:
+        await watcher.stop()
+        del _rc_watchers[key]
+    return {"ok": True, "was_watching": was_watching}
 
 def _has_gui() -> bool:
     if sys.platform.startswith("win") or sys.platform.startswith("darwin"):
@@ -320,7 +2373,14 @@ async def play(
     - backend="auto" (default): on GUI machines tries default handler (via .m3u), else falls back to VLC if available.
     - backend="default": always open with OS default handler.
     - backend="vlc": always launch VLC.
+    A failed launch also drops any cached resolution for the URL.
     """
+    result = await _play(url, backend, force_playlist, ctx)
+    if not result.get("ok"):
+        _invalidate_resolution(url)
+    return result
+
+async def _play(url: str, backend: str, force_playlist: bool, ctx: Optional[Context]) -> Dict[str, Any]:
     if backend == "default":
         r = await play_default(url=url, force_playlist=force_playlist, ctx=ctx)
         r["auto_path"] = "default (forced)"
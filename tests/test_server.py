@@ -0,0 +1,1253 @@
+import asyncio
+import inspect
+import json
+import os
+import socket
+import sys
+import time
+
+import httpx
+import pytest
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+# -------- Fake stream host --------
+
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413  # MPEG-1 layer III, 128 kbps, 44.1 kHz, stereo
+
+
+async def _serve(content_type: str, chunk: bytes):
+    """Answer every GET with `chunk` repeated forever; returns (server, base_url, bytes_sent)."""
+    sent = [0]
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            if request.startswith(b"HEAD "):
+                # Like many stream hosts: no HEAD support, so the resolver has to GET (and sniff)
+                writer.write(b"HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nConnection: close\r\n\r\n".encode())
+            while True:
+                writer.write(chunk)
+                sent[0] += len(chunk)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    srv = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = srv.sockets[0].getsockname()[1]
+    return srv, f"http://127.0.0.1:{port}", sent
+
+
+def _reply(body, content_type: str = "application/json", status: int = 200, **headers):
+    if not isinstance(body, (bytes, str)):
+        body = json.dumps(body)
+    return status, {"Content-Type": content_type, **headers}, body.encode() if isinstance(body, str) else body
+
+
+async def _serve_routes(routes):
+    """
+    Fake host answering each path from `routes`: a _reply() tuple, or a (possibly async) callable taking
+    (method, query) and returning one. Unknown paths get 404. Returns (server, base_url, requests seen).
+    """
+    seen = []
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            method, target = head.decode("latin-1").split(" ", 2)[:2]
+            parts = urlsplit(target)
+            query = dict(parse_qsl(parts.query))
+            seen.append((method, parts.path, query))
+            route = routes.get(parts.path, _reply("not found", "text/plain", 404))
+            if callable(route):
+                route = route(method, query)
+                if inspect.isawaitable(route):
+                    route = await route
+            status, headers, body = route
+            lines = [f"HTTP/1.1 {status} X", f"Content-Length: {len(body)}", "Connection: close"]
+            lines += [f"{k}: {v}" for k, v in headers.items()]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + (b"" if method == "HEAD" else body))
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    srv = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = srv.sockets[0].getsockname()[1]
+    return srv, f"http://127.0.0.1:{port}", seen
+
+
+def _run(coro):
+    async def main():
+        try:
+            return await asyncio.wait_for(coro, 15)
+        finally:
+            await server._mirrors.aclose()
+            await server._stop_rc_watchers()
+            server._close_rc_sessions()
+            await server._close_http_client()
+            server._resolve_cache.clear()
+            server._search_cache.clear()
+            server._host_caps.clear()
+    return asyncio.run(main())
+
+
+# -------- Probing endless bodies --------
+
+def test_probe_get_endless_audio_reads_sniff_budget():
+    async def go():
+        srv, base, sent = await _serve("audio/mpeg", MP3_FRAME * 4)
+        async with srv:
+            res = await server._probe_get(base + "/live", {})
+        return res, sent[0]
+
+    res, sent = _run(go())
+    assert res.truncated
+    assert len(res.body) == server.SNIFF_MAX_BYTES
+    assert sent < 16 * 1024 * 1024
+
+
+def test_probe_get_endless_html_reads_probe_budget():
+    async def go():
+        srv, base, _ = await _serve("text/html", b"<p>" + b"x" * 4093)
+        async with srv:
+            return await server._probe_get(base + "/", {})
+
+    res = _run(go())
+    assert res.truncated
+    assert len(res.body) == server.PROBE_MAX_BYTES
+
+
+def test_get_playable_stream_endless_audio_does_not_hang():
+    async def go():
+        srv, base, _ = await _serve("audio/mpeg", MP3_FRAME * 4)
+        async with srv:
+            return await server.get_playable_stream(base + "/live")
+
+    out = _run(go())
+    assert out["resolved_url"].endswith("/live")
+    assert out["content_type"] == "audio/mpeg"
+
+
+def test_get_playable_stream_endless_html_does_not_hang():
+    async def go():
+        srv, base, _ = await _serve("text/html", b"<html>" + b"x" * 4090)
+        async with srv:
+            return await server.get_playable_stream(base + "/")
+
+    out = _run(go())
+    assert any(n.startswith(server._UNRESOLVED_NOTE) for n in out["notes"])
+
+
+# -------- Playlists --------
+
+def test_parse_pls():
+    pl = server._parse_playlist(
+        "[playlist]\nNumberOfEntries=2\nFile2=http://b/2\nTitle2=Two\nFile1=http://a/1\nTitle1=One\nLength1=-1\n"
+    )
+    assert pl.format == "pls"
+    assert [e.url for e in pl.entries] == ["http://a/1", "http://b/2"]
+    assert pl.entries[0].title == "One" and pl.entries[0].duration == -1
+
+
+def test_parse_m3u_with_relative_entries():
+    pl = server._parse_playlist("#EXTM3U\n#EXTINF:-1,Station\nhttp://a/live\nrelative.mp3\n", "http://host/dir/list.m3u")
+    assert pl.format == "m3u"
+    assert pl.entries[0] == server._PlaylistEntry("http://a/live", "Station", -1.0)
+    assert pl.entries[1].url == "http://host/dir/relative.mp3"
+
+
+def test_parse_bare_text_is_not_a_playlist():
+    pl = server._parse_playlist("hello world\nnot a url\n", "http://host/")
+    assert pl.format is None and pl.entries == []
+
+
+def test_parse_hls_master():
+    pl = server._parse_playlist(
+        '#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=64000,CODECS="mp4a.40.5"\nlow/index.m3u8\n'
+        '#EXT-X-STREAM-INF:BANDWIDTH=128000,CODECS="mp4a.40.2"\nhigh/index.m3u8\n',
+        "http://host/master.m3u8",
+    )
+    assert pl.format == "hls_master"
+    assert [(e.url, e.bandwidth, e.codecs) for e in pl.entries] == [
+        ("http://host/low/index.m3u8", 64000, "mp4a.40.5"),
+        ("http://host/high/index.m3u8", 128000, "mp4a.40.2"),
+    ]
+
+
+def test_parse_hls_media():
+    pl = server._parse_playlist(
+        "#EXTM3U\n#EXT-X-TARGETDURATION:10\n#EXT-X-MEDIA-SEQUENCE:7\n#EXTINF:10.0,\nseg7.aac\n#EXTINF:10.0,\nseg8.aac\n",
+        "http://host/live/index.m3u8",
+    )
+    assert pl.format == "hls_media"
+    assert [e.url for e in pl.entries] == ["http://host/live/seg7.aac", "http://host/live/seg8.aac"]
+    assert pl.entries[0].duration == 10.0
+
+
+def test_parse_xspf():
+    pl = server._parse_playlist(
+        '<?xml version="1.0"?><playlist version="1" xmlns="http://xspf.org/ns/0/"><title>List</title>'
+        "<trackList><track><location>http://a/1?x=1&amp;y=2</location><title>One</title></track>"
+        "<track><title>No location</title></track></trackList></playlist>"
+    )
+    assert pl.format == "xspf"
+    assert pl.entries == [server._PlaylistEntry("http://a/1?x=1&y=2", "One")]
+
+
+def test_parse_asx():
+    pl = server._parse_playlist(
+        '<ASX version="3.0"><Title>List</Title><Entry><Title>One</Title><Ref HREF="http://a/1" /></Entry>'
+        '<ENTRYREF href="other.asx"/></ASX>',
+        "http://host/list.asx",
+    )
+    assert pl.format == "asx"
+    assert pl.entries == [server._PlaylistEntry("http://a/1", "One"), server._PlaylistEntry("http://host/other.asx")]
+
+
+# -------- Audio sniffing --------
+
+def _adts_frame(length: int = 200) -> bytes:
+    # AAC-LC, 44.1 kHz, 2 channels
+    header = bytes([0xFF, 0xF1, 0x50, 0x80 | (length >> 11) & 3, (length >> 3) & 0xFF, ((length & 7) << 5) | 0x1F, 0xFC])
+    return header + b"\x00" * (length - 7)
+
+
+def _ogg_page(packet: bytes) -> bytes:
+    return b"OggS" + b"\x00" * 22 + bytes([1, len(packet)]) + packet
+
+
+def test_sniff_mp3_frames():
+    assert server._sniff_audio(b"junk" + MP3_FRAME * 4) == {
+        "codec": "MP3", "mime": "audio/mpeg", "bitrate": 128, "sample_rate": 44100, "channels": 2,
+    }
+
+
+def test_sniff_mp3_after_id3_tag():
+    tag = b"ID3\x04\x00\x00\x00\x00\x00\x0a" + b"\x00" * 10
+    assert server._sniff_audio(tag + MP3_FRAME * 4)["bitrate"] == 128
+    # Tag running past the prefix still means MP3
+    assert server._sniff_audio(b"ID3\x04\x00\x00\x00\x01\x00\x00" + b"\x00" * 100) == {"codec": "MP3", "mime": "audio/mpeg"}
+
+
+def test_sniff_adts():
+    info = server._sniff_audio(_adts_frame() * 4)
+    assert info["codec"] == "AAC-LC" and info["mime"] == "audio/aac"
+    assert info["sample_rate"] == 44100 and info["channels"] == 2
+    assert info["bitrate"] == round(200 * 8 * 44100 / 1024 / 1000)
+
+
+def test_sniff_ogg_vorbis():
+    ident = b"\x01vorbis" + b"\x00" * 4 + bytes([2]) + (44100).to_bytes(4, "little") + b"\x00" * 4
+    ident += (96000).to_bytes(4, "little") + b"\x00" * 6
+    assert server._sniff_audio(_ogg_page(ident)) == {
+        "codec": "Vorbis", "mime": "audio/ogg", "sample_rate": 44100, "channels": 2, "bitrate": 96,
+    }
+
+
+def test_sniff_ogg_opus():
+    head = b"OpusHead" + bytes([1, 2]) + b"\x00" * 9
+    assert server._sniff_audio(_ogg_page(head)) == {"codec": "Opus", "mime": "audio/ogg", "sample_rate": 48000, "channels": 2}
+
+
+def test_sniff_flac():
+    streaminfo = b"\x00" * 10 + bytes([0x0A, 0xC4, 0x42]) + b"\x00" * 21
+    data = b"fLaC" + b"\x00" + len(streaminfo).to_bytes(3, "big") + streaminfo
+    assert server._sniff_audio(data) == {"codec": "FLAC", "mime": "audio/flac", "sample_rate": 44100, "channels": 2}
+
+
+def test_sniff_text_is_not_audio():
+    assert server._sniff_audio(b"<!DOCTYPE html><html><body>Not found</body></html>") is None
+    assert server._sniff_audio(b"\xff\xfb") is None
+
+def test_get_playable_stream_reports_sniffed_codec():
+    async def go():
+        srv, base, _ = await _serve("audio/mpeg", MP3_FRAME * 4)
+        async with srv:
+            return await server.get_playable_stream(base + "/live")
+
+    out = _run(go())
+    assert (out["codec"], out["bitrate"], out["sample_rate"], out["channels"]) == ("MP3", 128, 44100, 2)
+
+
+# -------- VLC RC replies --------
+
+def test_parse_rc_status():
+    text = "( new input: http://a/live )\n( audio volume: 256 )\n( state playing )\n"
+    assert server._parse_rc_status(text) == {
+        "input": "http://a/live", "volume": 256, "volume_percent": 50, "state": "playing",
+    }
+
+
+def test_parse_rc_info_and_stats():
+    info = server._parse_rc_info(
+        "+----[ Meta data ]\n| title: Foo\n+----[ Stream 0 ]\n| Type: Audio\n| Sample rate: 44100 Hz\n"
+        "| Bitrate: 128 kb/s\n+----[ end of stream info ]\n"
+    )
+    assert info == {
+        "meta": {"title": "Foo"},
+        "streams": [{"type": "audio", "sample_rate": 44100, "bitrate_kbps": 128, "index": 0}],
+    }
+    stats = server._parse_rc_stats("| input bitrate : 128 kb/s\n| bytes read : 2 KiB\n| lost buffers : 3\n")
+    assert stats == {"input_bitrate_kbps": 128, "bytes_read": 2048, "lost_buffers": 3}
+
+
+def test_parse_rc_reply_by_verb():
+    assert server._parse_rc_reply("get_time", "42\n") == {"seconds": 42}
+    assert server._parse_rc_reply("get_length", "\n") == {"seconds": None}
+    assert server._parse_rc_reply("is_playing", "1") == {"playing": True}
+    assert server._parse_rc_reply("volume", "512") == {"volume": 512, "volume_percent": 100}
+    assert server._parse_rc_reply("bogus", "Unknown command `bogus'. Type `help' for help.")["ok"] is False
+
+
+# -------- Offline catalog --------
+
+_FULL_STATION = {
+    "stationuuid": "s1", "changeuuid": "c1", "name": "Jazz FM", "country": "UK", "tags": "jazz",
+    "url": "http://a/live", "url_resolved": "http://a/live.mp3", "lastcheckok": 1, "codec": "MP3",
+    "bitrate": 128, "votes": 10, "clickcount": 42, "lastchangetime_iso8601": "2024-01-01T00:00:00Z",
+}
+# History record from json/stations/changed: no url_resolved, lastcheckok, codec, bitrate or clickcount
+_CHANGED_STATION = {
+    "stationuuid": "s1", "changeuuid": "c2", "name": "Jazz FM London", "country": "UK", "tags": "jazz",
+    "url": "http://a/live", "votes": 11, "lastchangetime_iso8601": "2024-02-01T00:00:00Z",
+}
+
+
+def test_catalog_sync_keeps_columns_missing_from_change_records(tmp_path, monkeypatch):
+    changed = json.dumps([_CHANGED_STATION])
+
+    async def go():
+        srv, base, seen = await _serve_routes({
+            "/json/stats": _reply({}),
+            "/json/stations": _reply([_FULL_STATION]),
+            "/json/stations/changed": lambda method, query: _reply(changed if query["lastchangeuuid"] == "c1" else []),
+        })
+        monkeypatch.setattr(server, "_mirrors", server._MirrorRegistry([base]))
+        catalog = server._StationCatalog(str(tmp_path / "catalog.db"))
+        async with srv:
+            try:
+                built = await catalog.build()
+                report = await catalog.sync()
+                rows = await catalog.search("jazz", None, None, 10)
+                return built, report, rows, await asyncio.to_thread(catalog._last_change_uuid), seen
+            finally:
+                catalog.close()
+
+    built, report, rows, last_uuid, seen = _run(go())
+    assert built["stations"] == 1
+    assert ("GET", "/json/stations/changed", {"lastchangeuuid": "c1", "limit": str(server.CATALOG_SYNC_PAGE)}) in seen
+    assert report["mode"] == "incremental"
+    assert report["rows_changed"] == 1 and report["bytes"] == len(changed)
+    assert last_uuid == "c2"
+    (row,) = rows
+    assert (row["name"], row["votes"], row["changeuuid"]) == ("Jazz FM London", 11, "c2")
+    assert (row["url_resolved"], row["lastcheckok"], row["codec"], row["bitrate"], row["clickcount"]) == (
+        "http://a/live.mp3", 1, "MP3", 128, 42,
+    )
+
+
+# -------- Streaming JSON --------
+
+def _collect_json_array(chunks):
+    async def body():
+        for chunk in chunks:
+            yield chunk.encode()
+
+    async def go():
+        return [item async for item in server._iter_json_array(httpx.Response(200, content=body()))]
+
+    return asyncio.run(go())
+
+
+def test_iter_json_array_across_chunk_splits():
+    text = json.dumps([{"name": "a\u00e9", "tags": "x,y]"}, {"name": "b", "n": [1, {"c": 2}]}, {}])
+    expected = json.loads(text)
+    for size in (1, 2, 7, len(text)):
+        assert _collect_json_array([text[i:i + size] for i in range(0, len(text), size)]) == expected
+
+
+def test_iter_json_array_waits_for_element_end_at_chunk_boundary():
+    assert _collect_json_array(["[1,2", "3]"]) == [1, 23]
+    assert _collect_json_array(['[{"a": 1}', "]"]) == [{"a": 1}]
+
+
+@pytest.mark.parametrize("chunks", [['[{"a": 1},'], ['[{"a": 1}'], ["["], ['[{"a": 1}, {"b":'], [""]])
+def test_iter_json_array_rejects_truncated_body(chunks):
+    with pytest.raises(ValueError):
+        _collect_json_array(chunks)
+
+
+def test_iter_json_array_rejects_non_array():
+    with pytest.raises(ValueError):
+        _collect_json_array(['{"error": "rate limited"}'])
+
+
+# -------- Radio Browser mirrors --------
+
+def _dead_base() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+_SEARCH_RESULT = [{"name": "Jazz FM", "stationuuid": "s1", "url": "http://a/live"}]
+
+
+def _mirror_routes(stats_delay: float = 0.0):
+    async def stats(method, query):
+        await asyncio.sleep(stats_delay)
+        return _reply({})
+
+    return {"/json/stats": stats, "/json/stations/search": _reply(_SEARCH_RESULT)}
+
+
+def test_rb_stream_fails_over_from_unreachable_mirror(monkeypatch):
+    async def go():
+        srv, live, seen = await _serve_routes(_mirror_routes())
+        dead = _dead_base()
+        registry = server._MirrorRegistry([dead, live])
+        monkeypatch.setattr(server, "_mirrors", registry)
+        async with srv:
+            stations = await server.find_station("jazz", rank=False)
+            return stations, registry, dead, live, seen
+
+    stations, registry, dead, live, seen = _run(go())
+    assert [s["stationuuid"] for s in stations] == ["s1"]
+    assert registry.mirrors[dead]["failures"] >= 1
+    assert registry.mirrors[dead]["down_until"] > time.monotonic()
+    assert registry.ranked() == [live, dead]
+    assert [p for _, p, _ in seen].count("/json/stations/search") == 1
+
+
+def test_rb_stream_fails_over_on_5xx(monkeypatch):
+    async def go():
+        srv_bad, bad, _ = await _serve_routes({"/json/stations/search": _reply("overloaded", "text/plain", 503)})
+        srv_ok, ok, _ = await _serve_routes(_mirror_routes())
+        registry = server._MirrorRegistry([bad, ok])
+        monkeypatch.setattr(server, "_mirrors", registry)
+        async with srv_bad, srv_ok:
+            async with server._rb_stream("/json/stations/search", {"name": "jazz"}) as r:
+                body = json.loads(await r.aread())
+            return body, registry, bad, ok
+
+    body, registry, bad, ok = _run(go())
+    assert body == _SEARCH_RESULT
+    assert registry.mirrors[bad]["down_until"] > time.monotonic()
+    assert registry.ranked()[0] == ok
+
+
+def test_rb_stream_raises_when_every_mirror_fails(monkeypatch):
+    async def go():
+        registry = server._MirrorRegistry([_dead_base(), _dead_base()])
+        monkeypatch.setattr(server, "_mirrors", registry)
+        monkeypatch.setattr(server, "MIRROR_PROBE_TIMEOUT", 0.2)
+        async with server._rb_stream("/json/stations/search"):
+            pass
+
+    with pytest.raises(httpx.TransportError):
+        _run(go())
+
+
+def test_mirror_refresh_ranks_by_rtt(monkeypatch):
+    async def go():
+        srv_slow, slow, _ = await _serve_routes(_mirror_routes(stats_delay=0.2))
+        srv_fast, fast, _ = await _serve_routes(_mirror_routes())
+        dead = _dead_base()
+        registry = server._MirrorRegistry([slow, dead, fast])
+        monkeypatch.setattr(server, "_mirrors", registry)
+        async with srv_slow, srv_fast:
+            await registry.refresh()
+            return registry.ranked(), slow, dead, fast
+
+    ranked, slow, dead, fast = _run(go())
+    assert ranked == [fast, slow, dead]
+
+
+def test_mirror_ranking_prefers_healthy_then_fastest():
+    registry = server._MirrorRegistry(["http://a", "http://b", "http://c"])
+    registry.mark_ok("http://a", 80.0)
+    registry.mark_ok("http://b", 20.0)
+    registry.mark_ok("http://c", 5.0)
+    registry.mark_failed("http://c")
+    assert registry.ranked() == ["http://b", "http://a", "http://c"]
+    registry.mark_ok("http://c")
+    assert registry.ranked() == ["http://c", "http://b", "http://a"]
+
+
+# -------- VLC RC client --------
+
+class _FakeVLC:
+    """VLC RC interface stand-in: a banner, then each command's reply followed by the "> " prompt."""
+
+    BANNER = b"VLC media player 3.0.20 Vetinari\nCommand Line Interface initialized. Type `help' for help.\n> "
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.state = "playing"
+        self.volume = 256
+        self.input = "http://a/live"
+        self.title = "Song A"
+        self.time = 0
+        self.commands = []
+        self.connects = 0
+        self._writers = []
+
+    def reply(self, cmd: str) -> str:
+        verb, _, arg = cmd.partition(" ")
+        if verb == "status":
+            return f"( new input: {self.input} )\n( audio volume: {self.volume} )\n( state {self.state} )\n"
+        if verb == "get_time":
+            return f"{self.time}\n"
+        if verb == "get_length":
+            return "0\n"  # live stream
+        if verb == "get_title":
+            return f"{self.title}\n"
+        if verb == "volume" and arg:
+            self.volume = int(arg)
+            return ""
+        if verb in ("pause", "stop"):
+            return ""
+        return f"Unknown command `{verb}'. Type `help' for help.\n"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connects += 1
+        self._writers.append(writer)
+        try:
+            writer.write(self.BANNER)
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                cmd = line.decode().strip()
+                self.commands.append(cmd)
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                writer.write(self.reply(cmd).encode() + b"> ")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def drop(self) -> None:
+        """Close every client connection, as a VLC restart would."""
+        for writer in self._writers:
+            writer.close()
+        self._writers.clear()
+
+    async def listen(self, port: int = 0) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def shut_down(self) -> None:
+        """Stop accepting and drop every client, as a VLC that quit would."""
+        self._server.close()
+        self.drop()
+
+    async def __aenter__(self) -> "_FakeVLC":
+        await self.listen()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.shut_down()
+
+
+def test_slow_rc_replies_do_not_delay_find_station(monkeypatch):
+    async def timed_search(query):
+        t0 = time.perf_counter()
+        assert await server.find_station(query, rank=False)
+        return time.perf_counter() - t0
+
+    async def go():
+        srv, base, _ = await _serve_routes(_mirror_routes())
+        monkeypatch.setattr(server, "_mirrors", server._MirrorRegistry([base]))
+        async with srv, _FakeVLC(delay=0.3) as vlc:
+            await timed_search("warmup")
+            baseline = min([await timed_search(f"alone {i}") for i in range(3)])
+            rc = asyncio.ensure_future(server.vlc_status(rc_port=vlc.port))
+            await asyncio.sleep(0.05)  # status is now waiting on VLC's reply
+            during = [await timed_search(f"during {i}") for i in range(3)]
+            rc_pending = not rc.done()
+            status = await rc
+        return baseline, during, rc_pending, status
+
+    baseline, during, rc_pending, status = _run(go())
+    assert rc_pending
+    assert status["ok"] and status["state"] == "playing"
+    # A blocking RC client would hold every search for at least one 0.3 s reply delay
+    assert max(during) < baseline + 0.1
+
+
+def test_slow_rc_replies_do_not_block_the_event_loop():
+    async def go():
+        async with _FakeVLC(delay=0.2) as vlc:
+            rc = asyncio.gather(server.vlc_status(rc_port=vlc.port), server.vlc_pause(rc_port=vlc.port))
+            gaps, last = [], time.perf_counter()
+            while not rc.done():
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+            return await rc, gaps
+
+    results, gaps = _run(go())
+    assert all(r["ok"] for r in results)
+    assert len(gaps) > 20 and max(gaps) < 0.1
+    assert results[0]["length_s"] == 0 and results[1]["state"] == "playing"
+
+
+# -------- Resolution cache --------
+
+def _expires_in(url: str) -> float:
+    return server._resolve_cache._data[url][0] - time.monotonic()
+
+
+def test_resolve_failure_is_cached_for_the_negative_ttl(monkeypatch):
+    monkeypatch.setattr(server, "RESOLVE_CACHE_NEGATIVE_TTL", 0.3)
+
+    async def go():
+        srv, base, seen = await _serve_routes({})
+        async with srv:
+            errors = []
+            for _ in range(2):
+                with pytest.raises(Exception) as e:
+                    await server.get_playable_stream(base + "/gone")
+                errors.append(str(e.value))
+            probes = len(seen)
+            ttl = _expires_in(base + "/gone")
+            await asyncio.sleep(0.35)
+            with pytest.raises(Exception) as e:
+                await server.get_playable_stream(base + "/gone")
+            return errors, probes, ttl, str(e.value), len(seen)
+
+    errors, probes, ttl, after_expiry, total = _run(go())
+    assert "404" in errors[0] and "failed recently" not in errors[0]
+    assert "failed recently" in errors[1] and "HTTP 404" in errors[1]
+    assert 0 < ttl <= 0.3
+    assert "failed recently" not in after_expiry and total > probes
+
+
+def test_unconfirmed_guess_gets_the_short_ttl():
+    async def go():
+        srv, base, _ = await _serve("text/html", b"<html>" + b"x" * 4090)
+        async with srv:
+            out = await server.get_playable_stream(base + "/")
+        return out, _expires_in(base + "/")
+
+    out, ttl = _run(go())
+    assert any(n.startswith(server._UNRESOLVED_NOTE) for n in out["notes"])
+    assert ttl <= server.RESOLVE_CACHE_NEGATIVE_TTL
+
+
+def test_confirmed_stream_is_cached_for_the_full_ttl():
+    async def go():
+        srv, base, seen = await _serve_routes({"/live": _reply(MP3_FRAME * 8, "audio/mpeg")})
+        async with srv:
+            first = await server.get_playable_stream(base + "/live")
+            probes = len(seen)
+            second = await server.get_playable_stream(base + "/live")
+            return first, second, probes, len(seen), _expires_in(base + "/live")
+
+    first, second, probes, total, ttl = _run(go())
+    assert first == second and total == probes
+    assert server.RESOLVE_CACHE_NEGATIVE_TTL < ttl <= server.RESOLVE_CACHE_TTL
+
+
+async def _serve_station():
+    """Fake host with /station.pls pointing at an MP3 stream on /live."""
+    routes = {"/live": _reply(MP3_FRAME * 8, "audio/mpeg")}
+    srv, base, seen = await _serve_routes(routes)
+    routes["/station.pls"] = _reply(f"[playlist]\nFile1={base}/live\n", "audio/x-scpls")
+    return srv, base, seen
+
+
+@pytest.mark.parametrize("by", ["input", "resolved"])
+def test_report_stream_failure_invalidates(by):
+    async def go():
+        srv, base, seen = await _serve_station()
+        async with srv:
+            out = await server.get_playable_stream(base + "/station.pls")
+            url = out["input_url"] if by == "input" else out["resolved_url"]
+            report = await server.report_stream_failure(url)
+            probes = len(seen)
+            await server.get_playable_stream(base + "/station.pls")
+            return out, report, probes, len(seen)
+
+    out, report, probes, total = _run(go())
+    assert out["resolved_url"].endswith("/live")
+    assert report == {"ok": True, "invalidated": 1}
+    assert total > probes
+
+
+@pytest.mark.parametrize("ok", [True, False])
+def test_failed_play_invalidates_the_resolved_url(monkeypatch, ok):
+    async def fake_play(url, backend, force_playlist, ctx):
+        return {"ok": ok}
+
+    monkeypatch.setattr(server, "_play", fake_play)
+
+    async def go():
+        srv, base, _ = await _serve_station()
+        async with srv:
+            out = await server.get_playable_stream(base + "/station.pls")
+            await server.play(out["resolved_url"])
+            return base, list(server._resolve_cache._data)
+
+    base, cached = _run(go())
+    assert cached == ([base + "/station.pls"] if ok else [])
+
+
+# -------- Host capabilities --------
+
+def test_missing_path_does_not_mark_host_as_headless():
+    async def go():
+        srv, base, seen = await _serve_routes({"/live": _reply(MP3_FRAME * 8, "audio/mpeg")})
+        async with srv:
+            with pytest.raises(httpx.HTTPStatusError):
+                await server.get_playable_stream(base + "/gone")
+            out = await server.get_playable_stream(base + "/live")
+            return out, seen
+
+    out, seen = _run(go())
+    assert not any(n.startswith("skipping HEAD") for n in out["notes"])
+    assert ("HEAD", "/live", {}) in seen
+
+
+def test_host_rejecting_head_is_remembered():
+    async def go():
+        srv, base, _ = await _serve("audio/mpeg", MP3_FRAME * 4)
+        async with srv:
+            await server.get_playable_stream(base + "/a")
+            return await server.get_playable_stream(base + "/b")
+
+    out = _run(go())
+    assert "skipping HEAD: host does not answer HEAD" in out["notes"]
+
+
+def test_host_caps_stats_count_only_resolver_lookups():
+    async def go():
+        srv, base, _ = await _serve_routes({"/a": _reply(MP3_FRAME * 8, "audio/mpeg"), "/b": _reply(MP3_FRAME * 8, "audio/mpeg")})
+        async with srv:
+            await server.get_playable_stream(base + "/a")
+            await server.get_playable_stream(base + "/b")
+        return (await server.cache_stats())["host_capabilities"]
+
+    server._host_caps.hits = server._host_caps.misses = 0
+    stats = _run(go())
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def _mock_client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True)
+
+
+def test_learned_https_origin_replaces_the_http_port(monkeypatch):
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append((request.method, str(request.url)))
+        if request.url.scheme == "http":
+            return httpx.Response(301, headers={"Location": f"https://radio.test{request.url.path}"})
+        return httpx.Response(200, headers={"Content-Type": "audio/mpeg"}, content=MP3_FRAME * 8)
+
+    async def go():
+        monkeypatch.setattr(server, "_http_client", _mock_client(handler))
+        first = await server.get_playable_stream("http://radio.test:8000/live")
+        requested.clear()
+        second = await server.get_playable_stream("http://radio.test:8000/other")
+        return first, second, server._host_caps.peek("radio.test:8000")
+
+    first, second, caps = _run(go())
+    assert first["resolved_url"] == "https://radio.test/live"
+    assert caps["https_redirect"] == "https://radio.test"
+    assert second["resolved_url"] == "https://radio.test/other"
+    assert requested == [("HEAD", "https://radio.test/other")]
+
+
+# -------- Stream measurement --------
+
+async def _serve_paced(first_byte_delay: float = 0.0, chunks: int = -1, interval: float = 0.01):
+    """Audio host that sends headers at once, its first MP3 chunk after first_byte_delay, then one
+    chunk per interval; after `chunks` chunks (-1: never) it goes silent but keeps the connection open."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: audio/mpeg\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            await asyncio.sleep(first_byte_delay)
+            sent = 0
+            while sent != chunks:
+                writer.write(MP3_FRAME * 2)
+                await writer.drain()
+                sent += 1
+                await asyncio.sleep(interval)
+            await reader.read()  # silent until the client hangs up
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    srv = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return srv, f"http://127.0.0.1:{srv.sockets[0].getsockname()[1]}/live"
+
+
+def _measure(monkeypatch, **pacing):
+    monkeypatch.setattr(server, "MEASURE_STALL_GRACE", 0.2)
+    monkeypatch.setattr(server, "MEASURE_FIRST_BYTE_TIMEOUT", 1.5)
+
+    async def go():
+        srv, url = await _serve_paced(**pacing)
+        async with srv:
+            t0 = time.perf_counter()
+            (out,) = await server.measure_streams([url], seconds=0.5)
+            return out, time.perf_counter() - t0
+
+    return _run(go())
+
+
+def test_measure_steady_stream(monkeypatch):
+    out, elapsed = _measure(monkeypatch)
+    assert out["ok"] and not out["stalled"]
+    assert out["first_byte_ms"] < 300 and out["max_gap_ms"] < 200
+    assert out["bytes"] > 0 and out["throughput_kbps"] > 0
+    assert (out["codec"], out["bitrate"]) == ("MP3", 128) and out["realtime_ratio"] > 0
+    assert elapsed < 1.0
+
+
+def test_measure_slow_first_byte_is_not_a_stall(monkeypatch):
+    # Longer than window + grace: the window must start at the first byte, not at the headers
+    out, _ = _measure(monkeypatch, first_byte_delay=0.9)
+    assert out["ok"] and not out["stalled"]
+    assert out["first_byte_ms"] >= 900
+    assert out["max_gap_ms"] < 200
+
+
+def test_measure_mid_stream_stall(monkeypatch):
+    out, elapsed = _measure(monkeypatch, chunks=3)
+    assert out["ok"] and out["stalled"]
+    assert out["max_gap_ms"] >= 500
+    assert elapsed < 1.5
+
+
+def test_measure_no_first_byte(monkeypatch):
+    out, _ = _measure(monkeypatch, first_byte_delay=5.0)
+    assert out["ok"] and out["stalled"]
+    assert out["first_byte_ms"] is None and out["bytes"] == 0
+
+
+# -------- Progressive search --------
+
+class _ProgressContext:
+    def __init__(self):
+        self.reports = []
+
+    async def report_progress(self, progress, total=None, message=None):
+        self.reports.append((progress, total, json.loads(message)))
+
+
+def _paged_search_routes(count: int):
+    # Upstream order is by name; votes make later stations the better matches
+    stations = [
+        {"name": f"Jazz {i:02d}", "stationuuid": f"s{i:02d}", "votes": i * 10, "lastcheckok": 1} for i in range(count)
+    ]
+
+    def search(method, query):
+        offset = int(query.get("offset", 0))
+        return _reply(stations[offset:offset + int(query["limit"])])
+
+    return {"/json/stats": _reply({}), "/json/stations/search": search}
+
+
+def _progressive_search(monkeypatch, count: int, limit: int, rank: bool = True):
+    async def go():
+        srv, base, _ = await _serve_routes(_paged_search_routes(count))
+        monkeypatch.setattr(server, "_mirrors", server._MirrorRegistry([base]))
+        ctx = _ProgressContext()
+        async with srv:
+            result = await server.find_station("jazz", limit=limit, progressive=True, rank=rank, ctx=ctx)
+        return result, ctx.reports
+
+    return _run(go())
+
+
+def test_progressive_pages_are_ranked_with_scores(monkeypatch):
+    result, reports = _progressive_search(monkeypatch, count=40, limit=40)
+    assert [(progress, total, len(page)) for progress, total, page in reports] == [(25, 40, 25), (40, 40, 15)]
+    for _, _, page in reports:
+        scores = [s["score"] for s in page]
+        assert scores == sorted(scores, reverse=True)
+    assert reports[0][2][0]["stationuuid"] == "s24"
+    assert [s["stationuuid"] for s in result[:2]] == ["s39", "s38"]
+
+
+def test_progressive_single_page_is_reported(monkeypatch):
+    result, reports = _progressive_search(monkeypatch, count=40, limit=10)
+    assert len(reports) == 1 and reports[0][:2] == (10, 10)
+    assert [s["stationuuid"] for s in reports[0][2]] == [s["stationuuid"] for s in result]
+
+
+def test_progressive_unranked_pages_keep_upstream_order(monkeypatch):
+    result, reports = _progressive_search(monkeypatch, count=30, limit=40, rank=False)
+    assert [len(page) for _, _, page in reports] == [25, 5]
+    assert [s["stationuuid"] for s in reports[0][2][:2]] == ["s00", "s01"]
+    assert "score" not in reports[0][2][0] and len(result) == 30
+
+
+# -------- Candidate racing --------
+
+def _attempts(*plan):
+    """One race attempt per (delay, result) pair; a result that is an exception is raised instead."""
+    log = {"started": [], "cancelled": []}
+
+    def make(i, delay, result):
+        async def run():
+            log["started"].append(i)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                log["cancelled"].append(i)
+                raise
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return run
+
+    return [make(i, d, r) for i, (d, r) in enumerate(plan)], log
+
+
+def _race(fns, stagger):
+    async def go():
+        t0 = time.perf_counter()
+        won = await server._race_staggered(fns, stagger)
+        return won, time.perf_counter() - t0
+
+    return asyncio.run(go())
+
+
+def test_race_fast_first_attempt_wins_alone():
+    fns, log = _attempts((0.01, "a"), (0.01, "b"))
+    won, _ = _race(fns, 0.2)
+    assert won == (0, "a") and log["started"] == [0]
+
+
+def test_race_slow_first_attempt_loses_after_one_stagger_and_is_cancelled():
+    fns, log = _attempts((1.0, "slow"), (0.01, "fast"), (0.01, "unused"))
+    won, elapsed = _race(fns, 0.2)
+    assert won == (1, "fast")
+    assert 0.2 <= elapsed < 0.5
+    assert log["started"] == [0, 1] and log["cancelled"] == [0]
+
+
+def test_race_failed_attempt_starts_the_next_without_waiting():
+    fns, log = _attempts((0.0, RuntimeError("dead")), (0.0, None), (0.01, "c"))
+    won, elapsed = _race(fns, 0.5)
+    assert won == (2, "c") and elapsed < 0.25
+    assert log["started"] == [0, 1, 2]
+
+
+def test_race_returns_none_when_every_attempt_fails():
+    fns, _ = _attempts((0.0, RuntimeError("dead")), (0.05, None))
+    won, _ = _race(fns, 0.01)
+    assert won is None
+
+
+def test_hanging_playlist_entry_costs_one_stagger():
+    async def go():
+        release = asyncio.Event()
+
+        async def hang(method, query):
+            await release.wait()
+            return _reply(MP3_FRAME, "audio/mpeg")
+
+        routes = {"/hang": hang, "/live": _reply(MP3_FRAME * 8, "audio/mpeg")}
+        srv, base, _ = await _serve_routes(routes)
+        routes["/station.pls"] = _reply(f"[playlist]\nFile1={base}/hang\nFile2={base}/live\n", "audio/x-scpls")
+        async with srv:
+            t0 = time.perf_counter()
+            out = await server.get_playable_stream(base + "/station.pls")
+            elapsed = time.perf_counter() - t0
+            release.set()
+            return out, elapsed, base
+
+    out, elapsed, base = _run(go())
+    assert out["resolved_url"] == base + "/live"
+    assert server.RESOLVE_RACE_STAGGER <= elapsed < server.RESOLVE_RACE_STAGGER + 0.5
+    assert f"hop 1: {base}/hang abandoned, another candidate answered first" in out["notes"]
+
+
+# -------- Nested playlists and redirects --------
+
+async def _serve_playlists(make_routes):
+    """Fake host whose routes are built from its own base URL by make_routes(base)."""
+    routes = {}
+    srv, base, seen = await _serve_routes(routes)
+    routes.update(make_routes(base))
+    return srv, base, seen
+
+
+def _resolve(make_routes, path):
+    async def go():
+        srv, base, _ = await _serve_playlists(make_routes)
+        async with srv:
+            return await server.get_playable_stream(base + path), base
+
+    return _run(go())
+
+
+M3U = "audio/x-mpegurl"
+HLS = "application/vnd.apple.mpegurl"
+
+
+def test_follows_pls_to_m3u_to_hls_master():
+    out, base = _resolve(lambda base: {
+        "/station.pls": _reply(f"[playlist]\nFile1={base}/list.m3u\n", "audio/x-scpls"),
+        "/list.m3u": _reply(f"#EXTM3U\n#EXTINF:-1,Station\n{base}/master.m3u8\n", M3U),
+        "/master.m3u8": _reply("#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=128000\nv/index.m3u8\n", HLS),
+        "/v/index.m3u8": _reply("#EXTM3U\n#EXT-X-TARGETDURATION:10\n#EXTINF:10,\nseg1.aac\n", HLS),
+    }, "/station.pls")
+    # Players get the adaptive master, not the variant that confirmed it
+    assert out["resolved_url"] == base + "/master.m3u8"
+    assert out["content_type"] == HLS
+
+
+def test_follows_redirects_to_the_stream():
+    out, base = _resolve(lambda base: {
+        "/go": _reply("", "text/plain", 302, Location="/live"),
+        "/live": _reply(MP3_FRAME * 8, "audio/mpeg"),
+    }, "/go")
+    assert out["resolved_url"] == base + "/live"
+
+
+def test_playlist_loop_is_skipped():
+    out, base = _resolve(lambda base: {
+        "/a.m3u": _reply(f"{base}/b.m3u\n", M3U),
+        "/b.m3u": _reply(f"{base}/a.m3u\n{base}/live\n", M3U),
+        "/live": _reply(MP3_FRAME * 8, "audio/mpeg"),
+    }, "/a.m3u")
+    assert out["resolved_url"] == base + "/live"
+    assert f"hop 2: {base}/a.m3u already visited; skipping loop" in out["notes"]
+
+
+def test_nesting_stops_at_max_depth(monkeypatch):
+    monkeypatch.setattr(server, "RESOLVE_MAX_DEPTH", 2)
+    out, base = _resolve(lambda base: {
+        "/0.m3u": _reply(f"{base}/1.m3u\n", M3U),
+        "/1.m3u": _reply(f"{base}/2.m3u\n", M3U),
+        "/2.m3u": _reply(f"{base}/live\n", M3U),
+        "/live": _reply(MP3_FRAME * 8, "audio/mpeg"),
+    }, "/0.m3u")
+    assert "hop 2: max playlist depth 2 reached" in out["notes"]
+    assert any(n.startswith(server._UNRESOLVED_NOTE) for n in out["notes"])
+
+
+# -------- Pooled RC sessions --------
+
+def test_rc_session_is_reused_across_commands():
+    async def go():
+        async with _FakeVLC() as vlc:
+            first = await server.vlc_status(rc_port=vlc.port)
+            second = await server.vlc_volume_set(50, rc_port=vlc.port)
+            return first, second, vlc.connects
+
+    first, second, connects = _run(go())
+    assert first["ok"] and second["ok"] and second["volume"] == 256
+    assert connects == 1
+
+
+@pytest.mark.parametrize("settle", [0.0, 0.05])
+def test_rc_session_reconnects_after_vlc_restart(settle):
+    # settle=0: the pooled connection still looks alive, so the first read hits the closed socket
+    async def go():
+        async with _FakeVLC() as vlc:
+            await server.vlc_status(rc_port=vlc.port)
+            vlc.drop()
+            await asyncio.sleep(settle)
+            vlc.title = "Song B"
+            status = await server.vlc_status(rc_port=vlc.port)
+            return status, vlc.connects
+
+    status, connects = _run(go())
+    assert status["ok"] and status["title"] == "Song B"
+    assert connects == 2
+
+
+def test_rc_session_closes_on_timeout_and_does_not_desync():
+    async def go():
+        async with _FakeVLC(delay=0.3) as vlc:
+            session = server._rc_session("127.0.0.1", vlc.port)
+            await session.run(["get_time"], timeout=1.0)
+            with pytest.raises(asyncio.TimeoutError):
+                await session.run(["get_title"], timeout=0.1)
+            closed = not session.connected
+            vlc.delay = 0.0
+            vlc.time = 42
+            replies = await session.run(["get_time"], timeout=1.0)
+            return closed, replies, vlc.connects
+
+    closed, replies, connects = _run(go())
+    assert closed
+    # The late "Song A" reply to get_title died with the old connection
+    assert replies == ["42\n"] and connects == 2
+
+
+def test_rc_session_idle_connection_is_closed(monkeypatch):
+    monkeypatch.setattr(server, "RC_SESSION_IDLE", 0.1)
+
+    async def go():
+        async with _FakeVLC() as vlc:
+            session = server._rc_session("127.0.0.1", vlc.port)
+            await session.run(["status"])
+            connected = session.connected
+            await asyncio.sleep(0.2)
+            return connected, session.connected
+
+    assert _run(go()) == (True, False)
+
+
+def test_rc_command_reports_unreachable_vlc():
+    async def go():
+        port = int(_dead_base().rsplit(":", 1)[1])
+        return await server.vlc_pause(rc_port=port)
+
+    out = _run(go())
+    assert out["ok"] is False and "ConnectionRefused" in out["error"]
+
+
+# -------- VLC playback watcher --------
+
+class _LogSession:
+    """Stands in for an MCP ServerSession; records what the watcher pushes."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.messages = []
+
+    async def send_log_message(self, level, data, logger=None, related_request_id=None):
+        if self.fail:
+            raise ConnectionError("client went away")
+        self.messages.append((level, logger, data))
+
+    def events(self, name=None):
+        return [data for _, _, data in self.messages if name is None or data["event"] == name]
+
+
+async def _until(pred, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not pred():
+        assert time.monotonic() < deadline, "timed out waiting for the watcher"
+        await asyncio.sleep(0.01)
+
+
+def _watch(vlc, *sessions, interval: float = 0.05):
+    watcher = server._RCWatcher("127.0.0.1", vlc.port, interval)
+    for session in sessions:
+        watcher.subscribers[id(session)] = session
+    server._rc_watchers[("127.0.0.1", vlc.port)] = watcher
+    watcher.start()
+    return watcher
+
+
+def test_watcher_reports_state_input_and_title_changes():
+    async def go():
+        log = _LogSession()
+        async with _FakeVLC() as vlc:
+            _watch(vlc, log)
+            await _until(lambda: log.events("watching"))
+            vlc.state = "paused"
+            await _until(lambda: log.events("state"))
+            vlc.input = "http://b/live"
+            vlc.title = "Song B"
+            await _until(lambda: log.events("input") and log.events("title"))
+        return log, vlc.port
+
+    log, port = _run(go())
+    (level, logger, greeting), *_ = log.messages
+    assert (level, logger) == ("info", "vlc")
+    assert greeting["rc"] == f"127.0.0.1:{port}"
+    assert (greeting["state"], greeting["input"], greeting["title"]) == ("playing", "http://a/live", "Song A")
+    assert [(e["state"], e["previous"]) for e in log.events("state")] == [("paused", "playing")]
+    assert [(e["input"], e["previous"]) for e in log.events("input")] == [("http://b/live", "http://a/live")]
+    assert [(e["title"], e["previous"]) for e in log.events("title")] == [("Song B", "Song A")]
+
+
+def test_watcher_reports_buffering_when_time_stops(monkeypatch):
+    monkeypatch.setattr(server, "RC_WATCH_STALL_SECONDS", 0.2)
+
+    async def go():
+        log = _LogSession()
+        async with _FakeVLC() as vlc:
+            _watch(vlc, log)
+            await _until(lambda: log.events("state"))  # get_time never moves
+            vlc.time = 5
+            await _until(lambda: len(log.events("state")) == 2)
+        return log
+
+    log = _run(go())
+    buffering, resumed = log.events("state")
+    assert (buffering["state"], buffering["previous"]) == ("buffering", "playing")
+    assert log.messages[1][0] == "warning"
+    assert (resumed["state"], resumed["previous"]) == ("playing", "buffering")
+
+
+def test_watcher_reports_one_outage_and_the_recovery():
+    async def go():
+        log = _LogSession()
+        async with _FakeVLC() as vlc:
+            _watch(vlc, log)
+            await _until(lambda: log.events("watching"))
+            vlc.shut_down()
+            await _until(lambda: log.events("state"))
+            await asyncio.sleep(0.3)  # several more failed polls
+            outage = list(log.messages)
+            await vlc.listen(vlc.port)
+            await _until(lambda: len(log.events("state")) == 2)
+        return log, outage
+
+    log, outage = _run(go())
+    down, up = log.events("state")
+    assert (down["state"], down["previous"]) == ("unreachable", "playing") and down["error"]
+    assert [level for level, _, data in outage if data["event"] == "state"] == ["warning"]
+    assert len(outage) == 2
+    assert (up["state"], up["previous"]) == ("playing", "unreachable")
+
+
+def test_watcher_drops_subscribers_that_went_away():
+    async def go():
+        gone, alive = _LogSession(fail=True), _LogSession()
+        async with _FakeVLC() as vlc:
+            watcher = _watch(vlc, gone, alive)
+            await _until(lambda: alive.events("watching"))
+            return set(watcher.subscribers) == {id(alive)}
+
+    assert _run(go())
+
+
+def test_vlc_watch_and_unwatch():
+    class Ctx:
+        session = _LogSession()
+
+    async def go():
+        async with _FakeVLC() as vlc:
+            watched = await server.vlc_watch(rc_port=vlc.port, interval=0.01, ctx=Ctx)
+            await _until(lambda: Ctx.session.events("watching"))
+            watcher = server._rc_watchers[("127.0.0.1", vlc.port)]
+            unwatched = await server.vlc_unwatch(rc_port=vlc.port, ctx=Ctx)
+            return watched, unwatched, watcher, ("127.0.0.1", vlc.port) in server._rc_watchers
+
+    watched, unwatched, watcher, still_watching = _run(go())
+    assert watched["ok"] and watched["subscribers"] == 1
+    assert watched["interval_s"] == server.RC_WATCH_MIN_INTERVAL
+    assert unwatched == {"ok": True, "was_watching": True}
+    assert not still_watching and watcher._task is None
+    assert _run(server.vlc_watch(ctx=None))["ok"] is False
+